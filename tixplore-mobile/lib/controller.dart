@@ -87,10 +87,16 @@ class AppController extends ChangeNotifier {
   List<Event> _events = [];
   List<Event> _favorites = [];
   String _currentMood = 'normal';
+  // Bearer token from /login, sent with every request once logged in
+  String? _token;
 
   List<Event> get events => _events;
   List<Event> get favorites => _favorites;
   String get currentMood => _currentMood;
+  bool get isLoggedIn => _token != null;
+
+  Map<String, String> get _headers =>
+      _token == null ? {} : {'Authorization': 'Bearer $_token'};
 
   Future<bool> login(String email, String password) async {
     try {
@@ -101,6 +107,8 @@ class AppController extends ChangeNotifier {
       final response = await http.get(uri);
 
       if (response.statusCode == 200) {
+        Map<String, dynamic> responseJson = json.decode(response.body);
+        _token = responseJson["token"];
         return true;
       }else{
         return false;
@@ -130,38 +138,84 @@ class AppController extends ChangeNotifier {
   }
 
   void logout() {
+    _token = null;
+    _favorites = [];
+    _favoritesCursor = null;
     notifyListeners();
   }
 
   // Event Methods
+  // The API returns one page at a time; these hold the next_cursor of the
+  // last page, null once everything is loaded
+  Map<String, String> _eventsQuery = {};
+  String? _eventsCursor;
+  String? _favoritesCursor;
+  bool _loadingEvents = false;
+  bool _loadingFavorites = false;
+
+  bool get hasMoreEvents => _eventsCursor != null;
+  bool get hasMoreFavorites => _favoritesCursor != null;
+
+  Future<Map<String, dynamic>> _getPage(String endpoint, Map<String, String> queryParameters, String? cursor) async {
+    final uri = Uri.parse('$BaseURL$endpoint').replace(
+      queryParameters: cursor == null ? queryParameters : {...queryParameters, 'cursor': cursor},
+    );
+    final response = await http.get(uri, headers: _headers);
+
+    if (response.statusCode != 200) {
+      throw Exception('Failed to load $endpoint');
+    }
+    return json.decode(response.body);
+  }
+
   Future<void> loadEvents(String category, String searchText) async {
     try {
-      const endpoint = '/get-events';
       var queryParameters = {'category': category};
 
       if(searchText.trim().length > 0){
         queryParameters['search_text'] = searchText;
       }
-      final uri = Uri.parse('$BaseURL$endpoint').replace(
-        queryParameters: queryParameters,
-      );
-      final response = await http.get(uri);
+      _eventsQuery = queryParameters;
+      _loadingEvents = true;
+      Map<String, dynamic> responseJson = await _getPage('/get-events', queryParameters, null);
 
-      if (response.statusCode == 200) {
-        Map<String, dynamic> responseJson = json.decode(response.body);
+      List<dynamic> eventsJson = responseJson["data"];
 
-        List<dynamic> eventsJson = responseJson["data"];
+      log(eventsJson.toString());
 
-        log(eventsJson.toString());
+      _events = eventsJson.map((eventJson) => Event.fromJson(eventJson)).toList();
+      _eventsCursor = responseJson["next_cursor"];
 
-        _events = eventsJson.map((eventJson) => Event.fromJson(eventJson)).toList();
+      notifyListeners();
+    } catch (e) {
+      print('Error loading events: $e');
+    } finally {
+      _loadingEvents = false;
+    }
+  }
 
-        notifyListeners();
-      } else {
-        throw Exception('Failed to load events');
+  Future<void> loadMoreEvents() async {
+    if (_eventsCursor == null || _loadingEvents) {
+      return;
+    }
+    _loadingEvents = true;
+    try {
+      final queryParameters = _eventsQuery;
+      Map<String, dynamic> responseJson = await _getPage('/get-events', queryParameters, _eventsCursor);
+
+      // A new search started while this page was loading
+      if (!identical(queryParameters, _eventsQuery)) {
+        return;
       }
+      List<dynamic> eventsJson = responseJson["data"];
+      _events.addAll(eventsJson.map((eventJson) => Event.fromJson(eventJson)));
+      _eventsCursor = responseJson["next_cursor"];
+
+      notifyListeners();
     } catch (e) {
       print('Error loading events: $e');
+    } finally {
+      _loadingEvents = false;
     }
   }
 
@@ -171,12 +225,12 @@ class AppController extends ChangeNotifier {
       final uri = Uri.parse('$BaseURL$endpoint').replace(
         queryParameters: {'event_id': event.id, "favorite" : event.isFavorite.toString()},
       );
-      final response = await http.post(uri);
+      final response = await http.post(uri, headers: _headers);
 
       if (response.statusCode == 200) {
         Map<String, dynamic> responseJson = json.decode(response.body);
 
-        if (responseJson["success"]) {
+        if (responseJson["is_success"]) {
           toggleFavorite(event.id);
         }
       } else {
@@ -189,22 +243,37 @@ class AppController extends ChangeNotifier {
 
 
   Future<void> loadFavorites() async {
+    _loadingFavorites = true;
     try {
-      final endpoint = '/favorites';
-      final uri = Uri.parse('$BaseURL$endpoint');
-      final response = await http.get(uri);
+      Map<String, dynamic> responseJson = await _getPage('/favorites', {}, null);
 
-      if (response.statusCode == 200) {
-        Map<String, dynamic> responseJson = json.decode(response.body);
+      List<dynamic> eventsJson = responseJson["data"];
+      _favorites = eventsJson.map((eventJson) => Event.fromJson(eventJson)).toList();
+      _favoritesCursor = responseJson["next_cursor"];
+      notifyListeners();
+    } catch (e) {
+      print('Error loading favorites: $e');
+    } finally {
+      _loadingFavorites = false;
+    }
+  }
 
-        List<dynamic> eventsJson = responseJson["data"];
-        _favorites = eventsJson.map((eventJson) => Event.fromJson(eventJson)).toList();
-        notifyListeners();
-      } else {
-        throw Exception('Failed to load favorites');
-      }
+  Future<void> loadMoreFavorites() async {
+    if (_favoritesCursor == null || _loadingFavorites) {
+      return;
+    }
+    _loadingFavorites = true;
+    try {
+      Map<String, dynamic> responseJson = await _getPage('/favorites', {}, _favoritesCursor);
+
+      List<dynamic> eventsJson = responseJson["data"];
+      _favorites.addAll(eventsJson.map((eventJson) => Event.fromJson(eventJson)));
+      _favoritesCursor = responseJson["next_cursor"];
+      notifyListeners();
     } catch (e) {
-      print('Error loading events: $e');
+      print('Error loading favorites: $e');
+    } finally {
+      _loadingFavorites = false;
     }
   }
 
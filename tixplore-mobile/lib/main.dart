@@ -447,6 +447,15 @@ class _MyHomePageState extends State<MyHomePage> with TickerProviderStateMixin {
     });
   }
 
+  Future<void> _loadMoreEvents() async {
+    final eventController = Provider.of<AppController>(context, listen: false);
+    await eventController.loadMoreEvents();
+    setState(() {
+      events = eventController.events.cast<Event>();
+      filteredEvents = events;
+    });
+  }
+
   void _searchEvents(String query) {
     Future.microtask(() async {
       final eventController = Provider.of<AppController>(context, listen: false);
@@ -498,11 +507,11 @@ class _MyHomePageState extends State<MyHomePage> with TickerProviderStateMixin {
                 ),
               ),
               Expanded(
-                child: _buildEventList(filteredEvents),
+                child: _buildEventList(filteredEvents, _loadMoreEvents),
               ),
             ],
           ),
-          _buildEventList(eventController.favorites.cast<Event>()),
+          _buildEventList(eventController.favorites.cast<Event>(), eventController.loadMoreFavorites),
         ],
       ),
       floatingActionButton: AIMoodSelector(
@@ -511,8 +520,16 @@ class _MyHomePageState extends State<MyHomePage> with TickerProviderStateMixin {
     );
   }
 
-  Widget _buildEventList(List<Event> eventList) {
-    return ListView.builder(
+  // Fetches the next page once the list is scrolled near its end
+  Widget _buildEventList(List<Event> eventList, Future<void> Function() onLoadMore) {
+    return NotificationListener<ScrollNotification>(
+      onNotification: (notification) {
+        if (notification.metrics.extentAfter < 500) {
+          onLoadMore();
+        }
+        return false;
+      },
+      child: ListView.builder(
       padding: const EdgeInsets.all(8),
       itemCount: eventList.length,
       itemBuilder: (context, index) {
@@ -626,6 +643,7 @@ class _MyHomePageState extends State<MyHomePage> with TickerProviderStateMixin {
           ),
         );
       },
+      ),
     );
   }
 
@@ -1,18 +1,25 @@
 import os
-from datetime import timedelta
 
-from quart import Quart, jsonify
-from quart_rate_limiter import RateLimiter, RateLimit
+from quart import Quart, Response, jsonify
+from prometheus_client import CONTENT_TYPE_LATEST
+from quart_rate_limiter import RateLimiter, rate_exempt, rate_limit
 from quart_schema import QuartSchema, RequestSchemaValidationError
 from quart_auth import QuartAuth
 from tortoise.contrib.quart import register_tortoise
 from tortoise import Tortoise
 
-from .api import api_bp
-
 app = Quart(__name__)
+# The config is loaded before the modules below, the route rate limits read it
 from .config import Config  # noqa
 
+from .api import api_bp  # noqa
+from .cache import listen_for_changes, response_cache  # noqa
+from .databases import tortoise_config  # noqa
+from .metrics import configure_logging, render_metrics  # noqa
+from .rate_limits import DEFAULT_LIMITS, create_store  # noqa
+
+configure_logging()
+
 QuartSchema(app)
 
 
@@ -25,28 +32,46 @@ async def handle_request_validation_error(error):
 
 QuartAuth(app)
 
-rate_limiter = RateLimiter(default_limits=[RateLimit(10, timedelta(seconds=5))])
+# Every route declares its own limits: quart-rate-limiter appends default
+# limits to a route's own list on each request, so the two can't be mixed
+rate_limiter = RateLimiter(store=create_store(app.config))
 rate_limiter.init_app(app)
 
+response_cache.init_app(app)
+
 app.register_blueprint(api_bp)
 
 register_tortoise(
     app,
-    db_url=app.config['DATABASE_URI'],
-    modules={"models": ["app.models"]},
+    config=tortoise_config(app.config),
     generate_schemas=False,
 )
 
 app.logger.info('>>> {}'.format(Config.FLASK_ENV))
 
 
+@app.before_serving
+async def start_cache_listener():
+    app.cache_listener = await listen_for_changes(app.config['DATABASE_URI'])
+
+
+@app.after_serving
+async def stop_cache_listener():
+    await app.cache_listener.close()
+
+
 @app.route('/')
+@rate_limit(limits=DEFAULT_LIMITS)
 async def index_client():
     return jsonify({'message': 'Hello, World!'})
 
 
+@app.route('/metrics')
+@rate_exempt
+async def metrics():
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
 async def init_tortoise():
-    await Tortoise.init(
-        db_url=app.config['DATABASE_URI'],
-        modules={"models": ["app.models"]},  # Replace with your actual module path
-    )
+    """Connect outside the web server: crawlers, the scheduler and one-time scripts"""
+    await Tortoise.init(config=tortoise_config(app.config, role='crawler'))
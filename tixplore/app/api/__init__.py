@@ -1,10 +1,39 @@
 """ API Blueprint Application """
+import time
 
-from quart import Blueprint, current_app
+from quart import Blueprint, current_app, g, request
+
+from ..metrics import (REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, REQUEST_SECONDS, QueryStats, log,
+                       request_queries)
 
 api_bp = Blueprint('api_bp', __name__,)
 
 
+# Both hooks are coroutines: Quart runs sync hooks in an executor under a
+# copied context, where setting request_queries would not reach the handler
+@api_bp.before_request
+async def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.query_stats = QueryStats()
+    request_queries.set(g.query_stats)
+
+
+@api_bp.after_request
+async def record_request_metrics(response):
+    if 'request_started' not in g:
+        # Rejected before the blueprint's before_request ran, e.g. by the rate limiter
+        return response
+    duration = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(duration)
+    REQUEST_DB_QUERIES.labels(route).observe(g.query_stats.count)
+    REQUEST_DB_SECONDS.labels(route).observe(g.query_stats.seconds)
+    log('request', route=route, method=request.method, status=response.status_code,
+        duration_ms=round(duration * 1000, 1), db_queries=g.query_stats.count,
+        db_ms=round(g.query_stats.seconds * 1000, 1))
+    return response
+
+
 @api_bp.after_request
 def add_header(response):
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
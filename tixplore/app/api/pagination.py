@@ -0,0 +1,72 @@
+""" Keyset pagination for the listing endpoints """
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+from ..models import Events
+
+# Sort keys whose cursor values are datetimes, stored as ISO strings
+DATETIME_KEYS = ('time',)
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(value, event_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, event_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[Union[str, float], int]:
+    try:
+        value, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise PaginationError('Invalid cursor.')
+    if not isinstance(value, (str, int, float)) or not isinstance(event_id, int):
+        raise PaginationError('Invalid cursor.')
+    return value, event_id
+
+
+def parse_limit(value: Optional[str], default: int, maximum: int) -> int:
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError('Invalid limit.')
+    if limit < 1:
+        raise PaginationError('Invalid limit.')
+    return min(limit, maximum)
+
+
+async def paginate(query: QuerySet, query_params: Dict, default: int, maximum: int,
+                   key: str = 'time', descending: bool = False) -> Tuple[List[Events], Optional[str]]:
+    """Return one page of events ordered by (key, id) and the cursor of the next page"""
+    limit = parse_limit(query_params.get('limit'), default, maximum)
+    cursor = query_params.get('cursor')
+
+    if cursor:
+        value, event_id = decode_cursor(cursor)
+        if key in DATETIME_KEYS:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise PaginationError('Invalid cursor.')
+        operator = 'lt' if descending else 'gt'
+        query = query.filter(Q(**{f'{key}__{operator}': value}) | Q(**{key: value, 'id__gt': event_id}))
+
+    # Fetch one extra row to know whether another page exists
+    events = await query.order_by(f"{'-' if descending else ''}{key}", 'id').limit(limit + 1)
+
+    if len(events) > limit:
+        events = events[:limit]
+        return events, encode_cursor(getattr(events[-1], key), events[-1].id)
+
+    return events, None
@@ -0,0 +1,67 @@
+""" Fast JSON responses with negotiated compression """
+import gzip
+from typing import List, Optional, TypedDict
+
+import orjson
+from quart import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Smaller bodies are not worth the compression overhead
+COMPRESSION_MIN_SIZE = 1024
+
+
+class TicketSiteOut(TypedDict):
+    name: str
+    price: float
+    url: str
+
+
+class EventOut(TypedDict):
+    id: str
+    name: str
+    type: str
+    genre: List[str]
+    location: str
+    time: str
+    imageUrl: str
+    description: str
+    director: str
+    cast: List[str]
+    duration: str
+    rating: float
+    ticket_sites: List[TicketSiteOut]
+    isFavorite: bool
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Best encoding the client accepts, br over gzip"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=4)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=5)
+    return body
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """Serialize payload with orjson and compress it if the client accepts it"""
+    body = orjson.dumps(payload)
+    encoding = negotiate_encoding() if len(body) >= COMPRESSION_MIN_SIZE else None
+
+    response = Response(compress(body, encoding), status=status, content_type='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding is not None:
+        response.content_encoding = encoding
+    return response
@@ -1,163 +1,221 @@
-import json
-
-from quart import Response, request
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from quart import Response, current_app, g, request
+from quart_auth import current_user, login_required
+from quart_rate_limiter import rate_exempt, rate_limit
+from quart_schema import validate_request
+from tortoise.exceptions import IntegrityError
 from tortoise.expressions import Q
 
 from . import api_bp
-from ..models import Users, TicketSites, Events
+from ..cache import cached_response
+from ..databases import pool_stats, read_connection
+from ..dates import parse_event_time, start_of_today
+from ..favorites import favorite_ids, set_favorites
+from ..genres import category_exists, filter_by_category
+from ..listings import load_listings
+from ..models import Users, Events
+from ..prices import HISTORY_BUCKETS, cheapest_offer, price_history
+from ..rate_limits import AUTH_LIMITS, DEFAULT_LIMITS, EVENTS_LIMITS
+from ..security import api_key_required, authenticate, hash_password, issue_token
+from ..venues import nearby_events
+from .pagination import PaginationError, paginate, parse_limit
+from .responses import json_response
+from .schemas import SetFavoritesRequest
+from .search import search_events, search_terms
+from .streaming import stream_listings
+
+MAX_FAVORITE_CHANGES = 500
+# Search radius of /events/nearby, in meters
+NEARBY_RADIUS_DEFAULT = 5000
+NEARBY_RADIUS_MAX = 50000
+UNIQUE_VIOLATION = '23505'  # Postgres SQLSTATE
+
+
+def _event_time_range(query_params: Dict) -> Tuple[datetime, Optional[datetime]]:
+    """Parse the from/to filters of /get-events. Past events are left out unless from says otherwise.
+
+    Dates without a time are whole local days, so to=2025-05-04 includes
+    the events of May 4th.
+    """
+    start = parse_event_time(query_params['from']) if 'from' in query_params else start_of_today()
+    end = None
+    if 'to' in query_params:
+        end = parse_event_time(query_params['to'])
+        if len(query_params['to']) == len('YYYY-MM-DD'):
+            end += timedelta(days=1)
+        if end <= start:
+            raise ValueError('Empty date range')
+    return start, end
+
+
+def _is_unique_violation(error: IntegrityError) -> bool:
+    # Tortoise wraps the asyncpg error, whose SQLSTATE tells a duplicate key from other constraints
+    cause = error.args[0] if error.args else None
+    return getattr(cause, 'sqlstate', None) == UNIQUE_VIOLATION
 
 
 @api_bp.get('/login')
+@rate_limit(limits=AUTH_LIMITS)
 async def login() -> Response:
     query_params = request.args.to_dict()
     email = query_params.get('email')
     password = query_params.get('password')
 
     if email is not None and password is not None:
-        user = await Users.get_or_none(email=email, password=password)
+        user = await authenticate(email, password)
 
         if user:
-            return Response(json.dumps({"is_success": True}), status=200, content_type='application/json')
+            return json_response({"is_success": True, "token": issue_token(user)}, status=200)
         else:
-            return Response(json.dumps({"is_success": False, 'message': 'Email or Password is wrong.'}), status=400,
-                            content_type='application/json')
+            return json_response({"is_success": False, 'message': 'Email or Password is wrong.'}, status=400)
 
     else:
-        return Response(json.dumps({"is_success": False, 'message': 'Unknown error occurred.'}), status=400,
-                        content_type='application/json')
+        return json_response({"is_success": False, 'message': 'Unknown error occurred.'}, status=400)
 
 
 @api_bp.get('/get-events')
+@rate_limit(limits=EVENTS_LIMITS)
+@cached_response
 async def get_events() -> Response:
     query_params = request.args.to_dict()
     category = query_params.get('category')
     search_text = query_params.get('search_text')
 
     if category is not None:
-        category_map = {
-            'enerjik': ['macera'],
-            'romantik': ['romantik', 'Tiyatro'],
-            'eğlenceli': ['Stand Up'],
-        }
+        if category != 'normal' and not await category_exists(category):
+            return json_response({"is_success": False, 'message': 'Invalid category.'}, status=400)
 
-        if category not in category_map and category != 'normal':
-            return Response(json.dumps({"is_success": False, 'message': 'Invalid category.'}), status=400)
+        try:
+            start, end = _event_time_range(query_params)
+        except ValueError:
+            return json_response({"is_success": False, 'message': 'Invalid date range.'}, status=400)
 
         try:
-            filter_query = Q()
+            replica = read_connection()
+            # Events overlapping [start, end): started in the range, or started earlier and still running
+            query = Events.filter(
+                Q(time__gte=start) | Q(end_time__gte=start), is_active=True, canonical_id__isnull=True
+            ).using_db(replica)
+            if end is not None:
+                query = query.filter(time__lt=end)
             if category != 'normal':
-                for genre in category_map[category]:
-                    filter_query |= Q(genre__icontains=genre)
-
-            if search_text is not None:
-                filter_query &= Q(name__icontains=search_text) | Q(description__icontains=search_text)
-
-            movies = await Events.filter(filter_query)
-
-            if len(movies) == 0:
-                return Response(
-                    json.dumps({"is_success": False, 'message': 'No movies found for this category.'}),
-                    status=404, content_type='application/json'
-                )
-
-            movie_data = {}
-
-            for movie in movies:
-                # Initialize movie data if not already created
-                if movie.id not in movie_data:
-                    movie_data[movie.id] = {
-                        "id": str(movie.id),  # Ensure the ID is a string
-                        "name": movie.name,
-                        "type": movie.type,
-                        "genre": movie.genre.split(',') if movie.genre else [],
-                        "location": movie.location,
-                        "time": movie.time.split('T')[0],
-                        "imageUrl": movie.image_url or '/api/placeholder/800/400',
-                        "description": movie.description,
-                        "director": movie.director,
-                        "cast": movie.cast,
-                        "duration": movie.duration,
-                        "rating": movie.rating,
-                        "ticket_sites": [],  # To store ticket sites
-                        "isFavorite": movie.favorite
-                    }
-
-                # Fetch related ticket sites
-                ticket_sites = await TicketSites.filter(event_id=movie.id).all()
-                for ticket in ticket_sites:
-                    movie_data[movie.id]["ticket_sites"].append({
-                        "name": ticket.name,
-                        "price": ticket.price,
-                        "url": ticket.url
-                    })
+                query = filter_by_category(query, category)
+            sort_key, descending = 'time', False
 
-            # Return response with joined movie data
-            return Response(
-                json.dumps({"is_success": True, "data": list(movie_data.values())}),
-                status=200, content_type='application/json'
+            if search_text is not None and search_terms(search_text):
+                query = search_events(query, search_text)
+                sort_key, descending = 'search_rank', True
+
+            if query_params.get('format') == 'ndjson':
+                user_id = int(current_user.auth_id) if current_user.auth_id is not None else None
+                return stream_listings(query, replica, user_id)
+
+            movies, next_cursor = await paginate(
+                query.only('id', 'time'), query_params,
+                current_app.config['PAGE_SIZE_DEFAULT'], current_app.config['PAGE_SIZE_MAX'],
+                key=sort_key, descending=descending
             )
+
+            if len(movies) == 0 and query_params.get('cursor') is None:
+                return json_response({"is_success": False, 'message': 'No movies found for this category.'}, status=404)
+
+            movie_ids = [movie.id for movie in movies]
+            if current_user.auth_id is not None:
+                movie_data = await load_listings(movies, await favorite_ids(int(current_user.auth_id), movie_ids), replica)
+            else:
+                movie_data = await load_listings(movies, using_db=replica)
+            g.cache_event_ids = movie_ids
+
+            # Return response with joined movie data
+            return json_response({"is_success": True, "data": movie_data, "next_cursor": next_cursor}, status=200)
+        except PaginationError as e:
+            return json_response({"is_success": False, 'message': str(e)}, status=400)
         except Exception as e:
-            return Response(
-                json.dumps({"is_success": False, 'message': 'An error occurred while fetching movies.'}),
-                status=500, content_type='application/json'
-            )
+            return json_response({"is_success": False, 'message': 'An error occurred while fetching movies.'}, status=500)
     else:
-        return Response(
-            json.dumps({"is_success": False, 'message': 'Category is not specified.'}),
-            status=400, content_type='application/json'
-        )
+        return json_response({"is_success": False, 'message': 'Category is not specified.'}, status=400)
+
+
+@api_bp.get('/events/nearby')
+@rate_limit(limits=EVENTS_LIMITS)
+@cached_response
+async def get_nearby_events() -> Response:
+    query_params = request.args.to_dict()
+
+    try:
+        latitude = float(query_params['lat'])
+        longitude = float(query_params['lon'])
+    except (KeyError, ValueError):
+        return json_response({"is_success": False, 'message': 'lat and lon are not provided.'}, status=400)
+    try:
+        radius = float(query_params.get('radius', NEARBY_RADIUS_DEFAULT))
+    except ValueError:
+        return json_response({"is_success": False, 'message': 'Invalid location or radius.'}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < radius <= NEARBY_RADIUS_MAX:
+        return json_response({"is_success": False, 'message': 'Invalid location or radius.'}, status=400)
+
+    try:
+        start, _ = _event_time_range(query_params)
+    except ValueError:
+        return json_response({"is_success": False, 'message': 'Invalid date range.'}, status=400)
+
+    try:
+        limit = parse_limit(query_params.get('limit'), current_app.config['PAGE_SIZE_DEFAULT'],
+                            current_app.config['PAGE_SIZE_MAX'])
+        nearby = await nearby_events(latitude, longitude, radius, start, limit)
+
+        events = [Events(id=event_id) for event_id, _ in nearby]
+        event_ids = [event_id for event_id, _ in nearby]
+        if current_user.auth_id is not None:
+            event_data = await load_listings(events, await favorite_ids(int(current_user.auth_id), event_ids),
+                                             read_connection())
+        else:
+            event_data = await load_listings(events, using_db=read_connection())
+        for data, (_, distance) in zip(event_data, nearby):
+            data['distance'] = round(distance)
+        g.cache_event_ids = event_ids
+
+        return json_response({"is_success": True, "data": event_data}, status=200)
+    except PaginationError as e:
+        return json_response({"is_success": False, 'message': str(e)}, status=400)
+    except Exception as e:
+        return json_response({"is_success": False, 'message': 'An error occurred while fetching events.'}, status=500)
 
 
 @api_bp.get('/favorites')
+@rate_limit(limits=DEFAULT_LIMITS)
+@login_required
+@cached_response
 async def get_favorites() -> Response:
     query_params = request.args.to_dict()
     category = query_params.get('category')
 
     if True:
         try:
-            favorite_events = await Events.filter(favorite=True).all()
-            movie_data = {}
-
-            for movie in favorite_events:
-                if movie.id not in movie_data:
-                    movie_data[movie.id] = {
-                        "id": str(movie.id),
-                        "name": movie.name,
-                        "type": movie.type,
-                        "location": movie.location,
-                        "time": movie.time,
-                        "imageUrl": movie.image_url or '/api/placeholder/800/400',
-                        "description": movie.description,
-                        "director": movie.director,
-                        "cast": movie.cast,
-                        "duration": movie.duration,
-                        "rating": movie.rating,
-                        "ticket_sites": [],
-                        "isFavorite": movie.favorite
-                    }
-
-                # Fetch related ticket sites
-                ticket_sites = await TicketSites.filter(event_id=movie.id).all()
-                for ticket in ticket_sites:
-                    movie_data[movie.id]["ticket_sites"].append({
-                        "name": ticket.name,
-                        "price": ticket.price,
-                        "url": ticket.url
-                    })
+            query = Events.filter(favorited_by__user_id=int(current_user.auth_id), is_active=True)
+            if query_params.get('format') == 'ndjson':
+                return stream_listings(query, user_id=int(current_user.auth_id))
 
-            # Return response with joined movie data
-            return Response(
-                json.dumps({"is_success": True, "data": list(movie_data.values())}),
-                status=200, content_type='application/json'
+            favorite_events, next_cursor = await paginate(
+                query.only('id', 'time'), query_params,
+                current_app.config['PAGE_SIZE_DEFAULT'], current_app.config['PAGE_SIZE_MAX']
             )
+            movie_data = await load_listings(favorite_events, {movie.id for movie in favorite_events})
+            g.cache_event_ids = [movie.id for movie in favorite_events]
+
+            # Return response with joined movie data
+            return json_response({"is_success": True, "data": movie_data, "next_cursor": next_cursor}, status=200)
+        except PaginationError as e:
+            return json_response({"is_success": False, 'message': str(e)}, status=400)
         except Exception as e:
-            return Response(
-                json.dumps({"is_success": False, 'message': 'An error occurred while fetching movies.'}),
-                status=500, content_type='application/json'
-            )
+            return json_response({"is_success": False, 'message': 'An error occurred while fetching movies.'}, status=500)
 
 
 @api_bp.post('/set-favorite')
+@rate_limit(limits=DEFAULT_LIMITS)
+@login_required
 async def set_favorite() -> Response:
     query_params = request.args.to_dict()
     event_id = query_params.get('event_id')
@@ -165,61 +223,108 @@ async def set_favorite() -> Response:
 
     if event_id is not None and is_favorite is not None:
         try:
-            event = await Events.get(id=event_id)
-            if is_favorite.lower() == 'true':
-                is_favorite = True
-            else:
-                is_favorite = False
-            event.favorite = is_favorite
-            await event.save()
+            if not await set_favorites(int(current_user.auth_id), [(int(event_id), is_favorite.lower() == 'true')]):
+                return json_response({"is_success": False, 'message': 'Event not found.'}, status=404)
 
-            return Response(
-                json.dumps({"is_success": True}),
-                status=200, content_type='application/json'
-            )
+            return json_response({"is_success": True}, status=200)
         except Exception as e:
-            return Response(
-                json.dumps({"is_success": False, 'message': 'An error occurred while setting favorite.'}),
-                status=500, content_type='application/json'
-            )
+            return json_response({"is_success": False, 'message': 'An error occurred while setting favorite.'}, status=500)
     else:
-        return Response(
-            json.dumps({"is_success": False, 'message': 'Event ID or is_favorite is not provided.'}),
-            status=400, content_type='application/json'
+        return json_response({"is_success": False, 'message': 'Event ID or is_favorite is not provided.'}, status=400)
+
+
+@api_bp.post('/set-favorites')
+@rate_limit(limits=DEFAULT_LIMITS)
+@login_required
+@validate_request(SetFavoritesRequest)
+async def set_favorites_batch(data: SetFavoritesRequest) -> Response:
+    if len(data.changes) > MAX_FAVORITE_CHANGES:
+        return json_response({"is_success": False, 'message': 'Too many changes.'}, status=400)
+
+    try:
+        updated = await set_favorites(
+            int(current_user.auth_id), [(change.event_id, change.favorite) for change in data.changes]
         )
+        return json_response({"is_success": True, "updated": updated}, status=200)
+    except Exception as e:
+        return json_response({"is_success": False, 'message': 'An error occurred while setting favorites.'}, status=500)
+
+
+@api_bp.get('/cheapest-offer')
+@rate_limit(limits=DEFAULT_LIMITS)
+async def get_cheapest_offer() -> Response:
+    query_params = request.args.to_dict()
+    event_id = query_params.get('event_id')
+
+    if event_id is None or not event_id.isdigit():
+        return json_response({"is_success": False, 'message': 'Event ID is not provided.'}, status=400)
+
+    try:
+        offer = await cheapest_offer(int(event_id))
+        if offer is None:
+            return json_response({"is_success": False, 'message': 'No offers found for this event.'}, status=404)
+        return json_response({"is_success": True, "data": offer}, status=200)
+    except Exception as e:
+        return json_response({"is_success": False, 'message': 'An error occurred while fetching offers.'}, status=500)
+
+
+@api_bp.get('/price-history')
+@rate_limit(limits=DEFAULT_LIMITS)
+async def get_price_history() -> Response:
+    query_params = request.args.to_dict()
+    event_id = query_params.get('event_id')
+    bucket = query_params.get('bucket', 'day')
+
+    if event_id is None or not event_id.isdigit():
+        return json_response({"is_success": False, 'message': 'Event ID is not provided.'}, status=400)
+    if bucket not in HISTORY_BUCKETS:
+        return json_response({"is_success": False, 'message': 'Invalid bucket.'}, status=400)
+
+    try:
+        # Parsed like the /get-events filters: times without an offset are local
+        end = parse_event_time(query_params['to']) if 'to' in query_params else datetime.now(timezone.utc)
+        start = parse_event_time(query_params['from']) if 'from' in query_params else end - timedelta(days=30)
+    except ValueError:
+        return json_response({"is_success": False, 'message': 'Invalid date range.'}, status=400)
+
+    try:
+        history = await price_history(int(event_id), start, end, bucket)
+        return json_response({"is_success": True, "data": history}, status=200)
+    except Exception as e:
+        return json_response({"is_success": False, 'message': 'An error occurred while fetching prices.'}, status=500)
+
 
 @api_bp.get('/register')
+@rate_limit(limits=AUTH_LIMITS)
 async def register_user():
     query_params = request.args.to_dict()
     email = query_params.get('email')
     password = query_params.get('password')
     name = query_params.get('name')
 
-    if email is not None and password is not None:
+    # Checked up front, so an IntegrityError below can only be a conflict or a bug, not missing input
+    if email and password and name:
         try:
-            user = await Users.get_or_none(email=email)
-            if user:
-                return Response(
-                    json.dumps({"is_success": False, 'message': 'User already exists.'}),
-                    status=400, content_type='application/json'
-                )
-
-            await Users.create(email=email, password=password, name=name)
-            return Response(
-                json.dumps({"is_success": True}),
-                status=200, content_type='application/json'
-            )
+            # The unique index on email settles concurrent registrations
+            await Users.create(email=email, password=await hash_password(password), name=name)
+            return json_response({"is_success": True}, status=200)
+        except IntegrityError as e:
+            if _is_unique_violation(e):
+                return json_response({"is_success": False, 'message': 'User already exists.'}, status=400)
+            return json_response({"is_success": False, 'message': 'An error occurred while registering user.'}, status=500)
         except Exception as e:
-            return Response(
-                json.dumps({"is_success": False, 'message': 'An error occurred while registering user.'}),
-                status=500, content_type='application/json'
-            )
+            return json_response({"is_success": False, 'message': 'An error occurred while registering user.'}, status=500)
     else:
-        return Response(
-            json.dumps({"is_success": False, 'message': 'Email or Password is not provided.'}),
-            status=400, content_type='application/json'
-        )
+        return json_response({"is_success": False, 'message': 'Email, Password or Name is not provided.'}, status=400)
+
+@api_bp.get('/db-pool-stats')
+@rate_limit(limits=DEFAULT_LIMITS)
+@api_key_required
+async def get_db_pool_stats() -> Response:
+    return json_response({"is_success": True, "data": pool_stats()}, status=200)
+
 
 @api_bp.get('/ping')
+@rate_exempt
 async def health_check() -> Response:
     return Response("PONG", status=200)
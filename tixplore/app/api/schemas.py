@@ -0,0 +1,14 @@
+""" Request bodies validated with quart-schema """
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class FavoriteChange:
+    event_id: int
+    favorite: bool
+
+
+@dataclass
+class SetFavoritesRequest:
+    changes: List[FavoriteChange]
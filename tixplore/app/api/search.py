@@ -0,0 +1,37 @@
+""" Full-text event search backed by the events.search_vector column """
+import re
+from typing import List
+
+from tortoise.expressions import RawSQL
+from tortoise.queryset import QuerySet
+
+from ..text import normalize_search_text
+
+SEARCH_CONFIG = 'tixplore_turkish'
+MAX_SEARCH_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(search_text: str) -> List[str]:
+    return _TERM_RE.findall(normalize_search_text(search_text))[:MAX_SEARCH_TERMS]
+
+
+def build_tsquery(terms: List[str]) -> str:
+    # Terms only contain word characters, so they are safe to inline.
+    # Every term is a prefix match so that results update while typing.
+    query = ' & '.join(f'{term}:*' for term in terms)
+    return f"to_tsquery('{SEARCH_CONFIG}', '{query}')"
+
+
+def search_events(query: QuerySet, search_text: str) -> QuerySet:
+    """Restrict the query to events matching search_text and annotate them with search_rank"""
+    terms = search_terms(search_text)
+    if not terms:
+        return query
+
+    tsquery = build_tsquery(terms)
+    return query.annotate(
+        search_match=RawSQL(f'"search_vector" @@ {tsquery}'),
+        search_rank=RawSQL(f'ts_rank("search_vector", {tsquery})'),
+    ).filter(search_match=True)
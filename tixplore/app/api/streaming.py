@@ -0,0 +1,72 @@
+""" NDJSON export of full event listings over a server-side cursor """
+from quart import Response, g
+from typing import AsyncIterator, List, Optional
+
+import orjson
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.queryset import QuerySet
+
+from ..favorites import favorite_ids
+from ..listings import refresh_listings
+from ..models import EventListings
+
+# Rows fetched from Postgres per round-trip while streaming
+CURSOR_PREFETCH = 500
+
+# isFavorite is per user, so it is merged into the stored row here. The
+# payload is NULL for events without a listing row yet.
+LISTING_LINES_SQL = """
+    SELECT e.id, (l.payload || jsonb_build_object('isFavorite', f.event_id IS NOT NULL))::text
+    FROM events e
+    LEFT JOIN event_listings l ON l.event_id = e.id
+    LEFT JOIN user_favorites f ON f.event_id = e.id AND f.user_id = $1::int
+    WHERE e.id IN ({ids_sql})
+    ORDER BY e.id
+"""
+
+
+async def _built_lines(event_ids: List[int], user_id: Optional[int]) -> AsyncIterator[bytes]:
+    """Build the missing listing rows of event_ids on the primary and yield them"""
+    await refresh_listings(event_ids)
+    favorites = await favorite_ids(user_id, event_ids) if user_id is not None else set()
+    for event_id, payload in await EventListings.filter(event_id__in=event_ids).values_list('event_id', 'payload'):
+        payload['isFavorite'] = event_id in favorites
+        yield orjson.dumps(payload) + b'\n'
+
+
+async def _listing_lines(events_query: QuerySet, using_db: Optional[BaseDBAsyncClient], user_id: Optional[int]):
+    sql = LISTING_LINES_SQL.format(ids_sql=events_query.values_list('id', flat=True).sql())
+    missing = []
+
+    async with (using_db or connections.get('default')).acquire_connection() as connection:
+        # asyncpg cursors only live inside a transaction
+        async with connection.transaction():
+            async for event_id, line in connection.cursor(sql, user_id, prefetch=CURSOR_PREFETCH):
+                if line is None:
+                    missing.append(event_id)
+                else:
+                    # The payload is already JSON text, so it is written out as is
+                    yield line.encode('utf-8') + b'\n'
+
+                if len(missing) >= CURSOR_PREFETCH:
+                    async for built in _built_lines(missing, user_id):
+                        yield built
+                    missing = []
+
+    # Rows built on the fly follow the stored ones, so they are not in id order
+    if missing:
+        async for built in _built_lines(missing, user_id):
+            yield built
+
+
+def stream_listings(events_query: QuerySet, using_db: Optional[BaseDBAsyncClient] = None,
+                    user_id: Optional[int] = None) -> Response:
+    """Stream the listing rows of every event matched by events_query, one JSON object per line.
+
+    Memory stays flat because rows are yielded as Postgres returns them
+    instead of being collected into one response body. isFavorite is set
+    for user_id, and is false for anonymous requests.
+    """
+    g.cache_skip = True
+    return Response(_listing_lines(events_query, using_db, user_id), status=200, content_type='application/x-ndjson')
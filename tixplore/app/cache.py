@@ -0,0 +1,205 @@
+""" In-process caches: listing responses and small TTL lookups """
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import FrozenSet, Iterable, Optional
+
+import asyncpg
+from quart import Response, g, request
+from quart_auth import current_user
+from tortoise import connections
+
+from .api.responses import negotiate_encoding
+
+CHANGE_CHANNEL = 'tixplore_events_changed'
+
+
+@dataclass
+class CacheEntry:
+    path: str
+    body: bytes
+    content_type: str
+    content_encoding: Optional[str]
+    etag: str
+    event_ids: Optional[FrozenSet[int]]
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU cache of rendered responses with a TTL.
+
+    Entries remember the events they contain so a write to one event only
+    drops the pages it appears on. Entries without event ids are dropped on
+    every invalidation.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+
+    def init_app(self, app):
+        self.max_entries = app.config['RESPONSE_CACHE_MAX_ENTRIES']
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+
+    def get(self, key) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def build(self, path: str, body: bytes, content_type: str, content_encoding: Optional[str] = None,
+              event_ids: Optional[Iterable[int]] = None) -> CacheEntry:
+        return CacheEntry(
+            path=path,
+            body=body,
+            content_type=content_type,
+            content_encoding=content_encoding,
+            etag=hashlib.sha1(body).hexdigest(),
+            event_ids=frozenset(event_ids) if event_ids is not None else None,
+            expires_at=time.monotonic() + self.ttl,
+        )
+
+    def set(self, key, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, event_ids: Optional[Iterable[int]] = None, paths: Iterable[str] = ()):
+        """Drop entries containing any of event_ids or served from paths, or everything if event_ids is None"""
+        self.generation += 1
+        if event_ids is None:
+            self._entries.clear()
+            return
+
+        event_ids = set(event_ids)
+        paths = set(paths)
+        stale = [
+            key for key, entry in self._entries.items()
+            if entry.path in paths or entry.event_ids is None or not entry.event_ids.isdisjoint(event_ids)
+        ]
+        for key in stale:
+            del self._entries[key]
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._entries.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def cached_response(f):
+    """Serve the handler's 200 responses from response_cache, with ETag/If-None-Match support.
+
+    Handlers record the ids of the events they rendered in g.cache_event_ids,
+    and set g.cache_skip for responses that must not be buffered.
+    """
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        # Bodies are stored compressed and carry per-user favorites,
+        # so the negotiated encoding and the user are part of the key
+        key = (
+            request.path, tuple(sorted(request.args.items(multi=True))),
+            negotiate_encoding(), current_user.auth_id,
+        )
+        entry = response_cache.get(key)
+
+        if entry is None:
+            generation = response_cache.generation
+            g.cache_event_ids = None
+            g.cache_skip = False
+            response = await f(*args, **kwargs)
+            if response.status_code != 200 or g.cache_skip:
+                return response
+
+            entry = response_cache.build(
+                request.path, await response.get_data(), response.content_type,
+                response.content_encoding, g.cache_event_ids
+            )
+            # Skip caching when a write landed while the response was being built
+            if generation == response_cache.generation:
+                response_cache.set(key, entry)
+
+        if entry.etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(entry.body, status=200, content_type=entry.content_type)
+            if entry.content_encoding is not None:
+                response.content_encoding = entry.content_encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    return decorated_function
+
+
+def _change_payload(event_ids: Optional[Iterable[int]], paths: Iterable[str]) -> str:
+    return json.dumps({
+        "event_ids": list(event_ids) if event_ids is not None else None,
+        "paths": list(paths),
+    })
+
+
+async def notify_events_changed(event_ids: Optional[Iterable[int]] = None, paths: Iterable[str] = ()):
+    """Invalidate cached responses in every API worker.
+
+    Pass the ids of updated events, or None when events were added or
+    removed since those can show up on any page.
+    """
+    if event_ids is not None:
+        event_ids = list(event_ids)
+    paths = list(paths)
+    response_cache.invalidate(event_ids, paths)
+    await connections.get('default').execute_query(
+        "SELECT pg_notify($1, $2)", [CHANGE_CHANNEL, _change_payload(event_ids, paths)]
+    )
+
+
+def _on_change(connection, pid, channel, payload):
+    try:
+        change = json.loads(payload)
+        response_cache.invalidate(change.get('event_ids'), change.get('paths', ()))
+    except (ValueError, AttributeError):
+        response_cache.invalidate()
+
+
+async def listen_for_changes(dsn: str) -> asyncpg.Connection:
+    """Open a dedicated connection that invalidates response_cache on change notifications"""
+    connection = await asyncpg.connect(dsn)
+    await connection.add_listener(CHANGE_CHANNEL, _on_change)
+    return connection
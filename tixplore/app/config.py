@@ -4,6 +4,7 @@ Global Flask Application Setting
 See `.flaskenv` for default settings.
  """
 
+import json
 import os
 from app import app
 
@@ -11,9 +12,42 @@ from app import app
 class Config(object):
     FLASK_ENV = os.getenv('FLASK_ENV', 'production')
     SECRET_KEY = os.getenv('FLASK_SECRET', 'secret-key')
-    DATABASE_URI = "postgres://postgres@localhost:5432/tixplore"
+    # /login returns a token that clients send as `Authorization: Bearer <token>`, see app.security.issue_token
+    QUART_AUTH_MODE = 'bearer'
+    DATABASE_URI = os.getenv('DATABASE_URI', "postgres://postgres@localhost:5432/tixplore")
+    DATABASE_REPLICA_URI = os.getenv('DATABASE_REPLICA_URI')
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 5000))  # ms
+    CRAWLER_DB_POOL_MIN = int(os.getenv('CRAWLER_DB_POOL_MIN', 1))
+    CRAWLER_DB_POOL_MAX = int(os.getenv('CRAWLER_DB_POOL_MAX', 4))
+    CRAWLER_STATEMENT_TIMEOUT = int(os.getenv('CRAWLER_STATEMENT_TIMEOUT', 300000))  # ms
     MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
     SALT = os.getenv('SALT', 'salt')
+    API_KEY_CACHE_TTL = int(os.getenv('API_KEY_CACHE_TTL', 60))
+    API_KEY_NEGATIVE_CACHE_TTL = int(os.getenv('API_KEY_NEGATIVE_CACHE_TTL', 10))
+    RATE_LIMIT_STORE_URI = os.getenv('RATE_LIMIT_STORE_URI')  # e.g. redis://localhost:6379/0
+    # Requests per window of anonymous clients; API key holders get RATE_LIMIT_API_KEY_FACTOR times more
+    RATE_LIMIT_DEFAULT = int(os.getenv('RATE_LIMIT_DEFAULT', 10))  # per 5 seconds
+    RATE_LIMIT_EVENTS = int(os.getenv('RATE_LIMIT_EVENTS', 30))  # per 10 seconds, event listings
+    RATE_LIMIT_AUTH = int(os.getenv('RATE_LIMIT_AUTH', 5))  # per minute, /login and /register, same for keys
+    RATE_LIMIT_API_KEY_FACTOR = int(os.getenv('RATE_LIMIT_API_KEY_FACTOR', 10))
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 50))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 200))
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512))
+    CRAWLER_CONCURRENCY = int(os.getenv('CRAWLER_CONCURRENCY', 8))
+    CRAWLER_RATE_PER_HOST = float(os.getenv('CRAWLER_RATE_PER_HOST', 10))
+    CRAWLER_BATCH_SIZE = int(os.getenv('CRAWLER_BATCH_SIZE', 100))
+    CRAWLER_PARSE_WORKERS = int(os.getenv('CRAWLER_PARSE_WORKERS', 2))
+    CRAWLER_METRICS_PORT = int(os.getenv('CRAWLER_METRICS_PORT', 0))  # 0 disables the metrics server
+    CRAWLER_CACHE_DIR = os.getenv('CRAWLER_CACHE_DIR')  # Raw response store, see app.crawlers.response_store
+    CRAWLER_INTERVALS = {
+        'bubilet': int(os.getenv('BUBILET_CRAWL_INTERVAL', 3600)),
+        'passo': int(os.getenv('PASSO_CRAWL_INTERVAL', 3600)),
+    }
+    CRAWLER_INTERVAL_JITTER = float(os.getenv('CRAWLER_INTERVAL_JITTER', 0.1))
+    PASSO_VENUES = json.loads(os.getenv('PASSO_VENUES', '[]'))
 
 
 app.config.from_object('app.config.Config')
@@ -2,60 +2,75 @@ import asyncio
 import base64
 import html
 import json
-import requests
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
 from bs4 import BeautifulSoup
-from app import init_tortoise
-from app.models import Events, TicketSites
+from app import app, init_tortoise
+from app.crawlers.http_client import HttpClient
+from app.crawlers.locks import CrawlLocked, crawl_lock
+from app.crawlers.persistence import EventWriter
+from app.crawlers.pipeline import Pipeline, SourceAdapter
+from app.crawlers.response_store import configured_store
+from app.dates import parse_event_time
+from app.dedup import name_key
+from app.metrics import CRAWLER_ERRORS, log
+from app.venues import coordinate, venue_data
+
+
+WEB_URL = 'https://www.bubilet.com.tr'
+
+
+def city_slug(city) -> str:
+    """URL path segment of a city on the Bubilet site, e.g. istanbul or afyonkarahisar"""
+    return city.get('slug') or name_key(city['adi']).replace(' ', '-')
 
 
 class Bubilet_Crawler:
+    base_url = 'https://apiv2.bubilet.com.tr/api'
+
+    def __init__(self, client: HttpClient, base_url: Optional[str] = None):
+        self.client = client
+        if base_url is not None:
+            self.base_url = base_url
 
-    def get_latest_tickets(self, ilid = None):
+    async def _get(self, path, ilid = None, endpoint = None):
         headers = {}
         if ilid is not None:
             headers['ilid'] = ilid
 
-        r = requests.get('https://apiv2.bubilet.com.tr/api/Anasayfa/6/Etkinlikler', headers=headers)
-        return r.json()
-    
-    def get_ticket_cities_and_counts(self):
-        r = requests.get('https://apiv2.bubilet.com.tr/api/etkinlik/EtkinlikSehirleri')
-        return r.json()
+        return await self.client.get_json(self.base_url + path, headers=headers, endpoint=endpoint)
 
-    def get_places_of_ticket(self, ticketId, ilid = None):
-        headers = {}
-        if ilid is not None:
-            headers['ilid'] = ilid
+    async def get_latest_tickets(self, ilid = None):
+        return await self._get('/Anasayfa/6/Etkinlikler', ilid)
 
-        r = requests.get('https://apiv2.bubilet.com.tr/api/Etkinlik/'+str(ticketId)+'/Mekanlar', headers=headers)
-        return r.json()
-    
+    async def get_ticket_cities_and_counts(self):
+        return await self._get('/etkinlik/EtkinlikSehirleri')
 
-    def get_details_of_ticket(self, ticketSlug, ilid = None):
-        headers = {}
-        if ilid is not None:
-            headers['ilid'] = ilid
+    async def get_places_of_ticket(self, ticketId, ilid = None):
+        return await self._get('/Etkinlik/'+str(ticketId)+'/Mekanlar', ilid)
 
-        r = requests.get('https://apiv2.bubilet.com.tr/api/Etkinlik/Slug/'+ticketSlug, headers=headers)
-        return r.json()
-    
-    
-    def get_prices_of_ticket(self, ticketId, ilid = None):
-        headers = {}
-        if ilid is not None:
-            headers['ilid'] = ilid
+    async def get_details_of_ticket(self, ticketSlug, ilid = None):
+        return await self._get('/Etkinlik/Slug/'+ticketSlug, ilid, endpoint='/api/Etkinlik/Slug/:slug')
 
-        r = requests.get('https://apiv2.bubilet.com.tr/api/Etkinlik/'+str(ticketId)+'/sessions/all', headers=headers)
-        encrypted_res = r.json() 
+    async def get_prices_of_ticket(self, ticketId, ilid = None):
+        encrypted_res = await self._get('/Etkinlik/'+str(ticketId)+'/sessions/all', ilid)
         return decyrpt_price(encrypted_res)['data']
-    
-    def get_genres_of_ticket(self, ticketId, ilid = None):
-        headers = {}
-        if ilid is not None:
-            headers['ilid'] = ilid
 
-        r = requests.get('https://apiv2.bubilet.com.tr/api/Etkinlik/'+str(ticketId)+'/Etiket', headers=headers)
-        return r.json()
+    async def get_genres_of_ticket(self, ticketId, ilid = None):
+        return await self._get('/Etkinlik/'+str(ticketId)+'/Etiket', ilid)
+
+    async def enrich_ticket(self, ticket, ilid = None):
+        """Fetch places, details, prices and genres of a ticket concurrently"""
+        ticket['places'], ticket['details'], ticket['prices'], ticket['genres'] = await asyncio.gather(
+            self.get_places_of_ticket(ticket['etkinlikId'], ilid),
+            self.get_details_of_ticket(ticket['slug']),
+            self.get_prices_of_ticket(ticket['etkinlikId'], ilid),
+            self.get_genres_of_ticket(ticket['etkinlikId'], ilid),
+        )
+        return ticket
 
 
 # js decrypt function
@@ -98,84 +113,139 @@ def decyrpt_price(g):
     return json.loads(H)
 
 
-async def main():
-    await  init_tortoise()
-
-    async def save_database(movie):
-        name = movie['etkinlikAdi']
-
-        event = await Events.filter(name=name).first()
-
-        if event is None:
-            typevar = movie['genres'][0]['adi']
-            location = movie['places'][0]['baslik']
-            genre = ','.join([genre['adi'] for genre in movie['genres']])
-            time = movie['prices'][0]['sessions'][0]['tarih'].split('T')[0]
-            image_url= next((('https://cdn.bubilet.com.tr' + e['url']) for e in (movie['details']['dosyalar']) if e['gosterimYeri'] == 'dikeyResim'), '')
-            description = BeautifulSoup(html.unescape(html.unescape(movie['details']['ozet'])), "html.parser").get_text()
-            director = ''
-            cast = []
-            duration = movie['details']['sure']
-            rating = 0
-            favorite = False
-
-            event = await Events.create(
-                name=name,
-                type=typevar,
-                location=location,
-                time=time,
-                image_url=image_url,
-                description=description,
-                director=director,
-                cast=cast,
-                duration=duration,
-                rating=rating,
-                genre=genre,
-                favorite=favorite
-            )
-
-        source = 'bubilet.com'
-        price = movie['prices'][0]['sessions'][0]['indirimliFiyat']
-        url = 'https://www.bubilet.com.tr/istanbul/etkinlik/' + movie['slug']
-        event_id = event.id
-
-        await TicketSites.create(
-            name=source,
-            price=price,
-            url=url,
-            event_id=event_id
-        )
-
-    crawler = Bubilet_Crawler()
-
-    latest = crawler.get_latest_tickets(str(34))
-
-    result = []
-
-    print(len(latest))
-
-    for index, ticket in enumerate(latest):
-        print(index, ticket['slug'])
-        ticket['places'] = crawler.get_places_of_ticket(ticket['etkinlikId'], str(34))
-        # time.sleep(5 * random.random())
-        ticket['details'] = crawler.get_details_of_ticket(ticket['slug'])
-        # time.sleep(5 * random.random())
-        ticket['prices'] = crawler.get_prices_of_ticket(ticket['etkinlikId'], str(34))
-        # time.sleep(5 * random.random())
-        ticket['genres'] = crawler.get_genres_of_ticket(ticket['etkinlikId'], str(34))
-        # time.sleep(5 * random.random())
-        await save_database(ticket)
-
-        result.append(ticket)
-
-    #
-    # with open("bubilet_result.json", "w") as file:
-    #     json.dump(result, file, indent=4)
+def parse_place(place: Dict) -> Optional[Dict]:
+    """venue_data of an entry of the /Etkinlik/{id}/Mekanlar response"""
+    return venue_data(
+        place.get('id'), place['baslik'], place.get('ilAdi'), coordinate(place, 'enlem'), coordinate(place, 'boylam'),
+    )
+
+
+def parse_ticket(movie):
+    """Parse an enriched Bubilet ticket into the format matching our Events model"""
+    session_times = sorted(parse_event_time(session['tarih'])
+                           for price in movie['prices'] for session in price['sessions'])
+    place = movie['places'][0]
+    return {
+        'external_id': str(movie['etkinlikId']),
+        'name': movie['etkinlikAdi'],
+        'type': movie['genres'][0]['adi'],
+        'location': place['baslik'],
+        'genre': ','.join([genre['adi'] for genre in movie['genres']]),
+        'time': session_times[0],
+        'end_time': session_times[-1] if len(session_times) > 1 else None,
+        'image_url': next((('https://cdn.bubilet.com.tr' + e['url']) for e in (movie['details']['dosyalar']) if e['gosterimYeri'] == 'dikeyResim'), ''),
+        'description': BeautifulSoup(html.unescape(html.unescape(movie['details']['ozet'])), "html.parser").get_text(),
+        'director': '',
+        'cast': [],
+        'duration': movie['details']['sure'],
+        'rating': 0,
+        'venue_data': parse_place(place),
+        'ticket_sites_data': [
+            {
+                'name': 'bubilet.com',
+                'price': movie['prices'][0]['sessions'][0]['indirimliFiyat'],
+                'url': f"{WEB_URL}/{movie['citySlug']}/etkinlik/{movie['slug']}",
+            }
+        ],
+    }
+
+
+class BubiletSource(SourceAdapter):
+    source = 'bubilet'
+    parse = staticmethod(parse_ticket)
+
+    def __init__(self, crawler: Bubilet_Crawler, ilids = None):
+        self.crawler = crawler
+        self.ilids = ilids
+        self.city_slugs: Dict[str, str] = {}
+
+    async def listings(self):
+        cities = await self.crawler.get_ticket_cities_and_counts()
+        cities = sorted(cities, key=lambda city: city.get('etkinlikSayisi', 0), reverse=True)
+        self.city_slugs = {str(city['id']): city_slug(city) for city in cities}
+        # City ids with events, busiest first
+        with_events = [str(city['id']) for city in cities if city.get('etkinlikSayisi', 1) > 0]
+
+        ilids = [str(ilid) for ilid in self.ilids] if self.ilids is not None else with_events
+        unknown = set(ilids) - set(self.city_slugs)
+        if unknown:
+            raise ValueError(f"Unknown Bubilet city ids: {', '.join(sorted(unknown))}")
+        # Events of cities left out were not looked for, so they must not be deactivated
+        self.complete = set(with_events) <= set(ilids)
+        seen = set()
+
+        for ilid in ilids:
+            latest = await self.crawler.get_latest_tickets(ilid)
+            log('city_listed', source=self.source, ilid=ilid, events=len(latest))
+            for ticket in latest:
+                # Touring events are listed in every city they visit
+                if ticket['etkinlikId'] not in seen:
+                    seen.add(ticket['etkinlikId'])
+                    yield ilid, ticket
+
+    def external_id(self, listing):
+        ilid, ticket = listing
+        return str(ticket['etkinlikId'])
+
+    def listing_data(self, listing):
+        ilid, ticket = listing
+        return ticket
+
+    async def fetch(self, listing):
+        ilid, ticket = listing
+        # Enrich a copy so the listing entry stays as fingerprinted
+        ticket = await self.crawler.enrich_ticket(dict(ticket), ilid)
+        ticket['citySlug'] = self.city_slugs[ilid]
+        place = ticket['places'][0] if ticket.get('places') else {}
+        if coordinate(place, 'enlem') is None or coordinate(place, 'boylam') is None:
+            # The event is still crawled, but /events/nearby can't find it
+            CRAWLER_ERRORS.labels(self.source, 'venue', 'VenueLocationMissing').inc()
+            log('crawl_error', logging.ERROR, source=self.source, stage='venue', venue=place.get('baslik'),
+                error='VenueLocationMissing', message='Venue has no enlem and boylam')
+        return (ticket,)
+
+    def done(self, listing, succeeded):
+        ilid, ticket = listing
+        if succeeded:
+            log('event_crawled', logging.DEBUG, source=self.source, slug=ticket['slug'])
+
+
+async def crawl(full: bool = False, ilids = None, replay: bool = False) -> EventWriter:
+    """Crawl the given cities, or every city with events, and return the writer with its counts.
+
+    With replay set, every response comes from the response store and the
+    whole crawl is re-parsed and re-written without touching the network.
+    The replayed prices are not added to the price history, they are not
+    current observations.
+
+    Raises CrawlLocked while another process crawls the same source.
+    """
+    async with crawl_lock('bubilet'):
+        async with HttpClient(
+            concurrency=app.config['CRAWLER_CONCURRENCY'],
+            rate_per_host=app.config['CRAWLER_RATE_PER_HOST'],
+            store=configured_store(app.config),
+            replay=replay,
+        ) as client, EventWriter(
+            'bubilet', app.config['CRAWLER_BATCH_SIZE'], incremental=not (full or replay), observe_prices=not replay
+        ) as writer:
+            with ProcessPoolExecutor(app.config['CRAWLER_PARSE_WORKERS']) as executor:
+                source = BubiletSource(Bubilet_Crawler(client), ilids)
+                await Pipeline(
+                    source, writer, executor,
+                    fetch_workers=app.config['CRAWLER_CONCURRENCY'],
+                    parse_workers=app.config['CRAWLER_PARSE_WORKERS'],
+                ).run()
+    return writer
+
+
+async def main(full: bool = False, replay: bool = False):
+    await init_tortoise()
+    try:
+        await crawl(full, replay=replay)
+    except CrawlLocked:
+        log('crawl_skipped', source='bubilet', reason='another crawl is running')
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
-
-
-
-
+    asyncio.run(main('--full' in sys.argv, '--replay' in sys.argv))
@@ -0,0 +1,144 @@
+""" Shared async HTTP client for the crawlers """
+import asyncio
+import json
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.crawlers.response_store import ReplayMiss, ResponseStore
+from app.metrics import CRAWLER_HTTP_SECONDS, endpoint_label
+
+
+class HostRateLimiter:
+    """Spaces out request start times per host to at most `rate` requests per second"""
+
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1 / rate if rate else 0
+        self._next_slot = {}
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _decode(body: bytes):
+    # Matches aiohttp's response.json(), which returns None for an empty body
+    return json.loads(body) if body.strip() else None
+
+
+class HttpClient:
+    """One pooled keep-alive session with bounded parallelism and per-host rate limiting.
+
+    Requests answered with 429/5xx or failing at the connection level are
+    retried with exponential backoff. Use it as an async context manager so
+    the session is closed after the crawl.
+
+    With a store, every response body is kept on disk and later requests
+    are conditional; a 304 is answered from the store. With replay set,
+    no session is opened and every request is answered from the store.
+    """
+
+    def __init__(self, headers: Optional[Dict] = None, concurrency: int = 8,
+                 rate_per_host: Optional[float] = 10.0, timeout: float = 30,
+                 retries: int = 3, backoff: float = 0.5,
+                 store: Optional[ResponseStore] = None, replay: bool = False):
+        if replay and store is None:
+            raise ValueError('Replaying needs a response store')
+        self.headers = headers or {}
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = HostRateLimiter(rate_per_host)
+        self.store = store
+        self.replay = replay
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        if self.replay:
+            return self
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session is not None:
+            await self.session.close()
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt * (1 + random.random())
+
+    async def get_json(self, url: str, headers: Optional[Dict] = None, endpoint: Optional[str] = None):
+        """Decoded JSON of url. endpoint labels the request's latency metric, by default its path with ids folded"""
+        endpoint = endpoint or endpoint_label(urlsplit(url).path)
+        if self.store is None:
+            body, _ = await self._fetch(url, headers, endpoint)
+            return _decode(body)
+
+        key = ResponseStore.request_key(url, headers)
+        stored = await self.store.load(key)
+        if self.replay:
+            if stored is None:
+                raise ReplayMiss(url)
+            return _decode(stored[1])
+
+        conditional = dict(headers or {})
+        if stored is not None:
+            entry, _ = stored
+            if entry['etag']:
+                conditional['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                conditional['If-Modified-Since'] = entry['last_modified']
+
+        body, response_headers = await self._fetch(url, conditional, endpoint)
+        if body is None:
+            # 304 Not Modified
+            return _decode(stored[1])
+        await self.store.save(key, url, body, response_headers.get('ETag'), response_headers.get('Last-Modified'))
+        return _decode(body)
+
+    async def _fetch(self, url: str, headers: Optional[Dict], endpoint: str):
+        """Raw body of url, None for a 304, and the response headers"""
+        host = urlsplit(url).netloc
+
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            async with self._semaphore:
+                await self.rate_limiter.wait(host)
+                started = time.perf_counter()
+                try:
+                    async with self.session.get(url, headers=headers) as response:
+                        retry = response.status in RETRY_STATUSES
+                        body = None if retry or response.status == 304 else await response.read()
+                        CRAWLER_HTTP_SECONDS.labels(host, endpoint, response.status).observe(
+                            time.perf_counter() - started)
+                        if not retry:
+                            return body, response.headers
+                        if attempt == self.retries:
+                            response.raise_for_status()
+                        retry_after = response.headers.get('Retry-After')
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    CRAWLER_HTTP_SECONDS.labels(host, endpoint, type(e).__name__).observe(time.perf_counter() - started)
+                    if attempt == self.retries:
+                        raise
+
+            # Back off outside the semaphore so other requests can proceed
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
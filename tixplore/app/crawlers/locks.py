@@ -0,0 +1,29 @@
+""" Cross-process lock that keeps two crawls of one source from overlapping """
+import zlib
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from app import app
+
+
+class CrawlLocked(Exception):
+    """Another process is already crawling the source"""
+
+
+@asynccontextmanager
+async def crawl_lock(source: str):
+    """Hold the Postgres advisory lock of source for the duration of a crawl, or raise CrawlLocked.
+
+    The lock lives on a connection of its own, outside the Tortoise pool,
+    so it is held for exactly as long as the block runs.
+    """
+    lock_key = zlib.crc32(f'crawl:{source}'.encode('utf-8'))
+    connection = await asyncpg.connect(app.config['DATABASE_URI'])
+    try:
+        if not await connection.fetchval('SELECT pg_try_advisory_lock($1)', lock_key):
+            raise CrawlLocked(source)
+        yield
+    finally:
+        # Closing the session releases the advisory lock
+        await connection.close()
@@ -1,19 +1,55 @@
 import asyncio
+import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 
-import requests
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 from datetime import datetime
 from tortoise import Model, fields
 
-from app import init_tortoise
-from app.models import Events, TicketSites
+from app import app, init_tortoise
+from app.crawlers.http_client import HttpClient
+from app.crawlers.locks import CrawlLocked, crawl_lock
+from app.crawlers.persistence import EventWriter
+from app.crawlers.pipeline import CrawlError, Pipeline, SourceAdapter
+from app.crawlers.response_store import configured_store
+from app.dates import parse_event_time
+from app.metrics import CRAWLER_ERRORS, log
+from app.venues import coordinate, venue_data
+
+WEB_URL = "https://www.passo.com.tr"
+
+
+@dataclass
+class VenueProgress:
+    name: str
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def done(self) -> bool:
+        return self.succeeded + self.failed >= self.total
+
+    def log_fields(self) -> Dict:
+        return {
+            'venue': self.name,
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'seconds': round(time.monotonic() - self.started_at, 1),
+        }
 
 
 class PassoCrawler:
-    def __init__(self):
+    def __init__(self, client: HttpClient):
+        self.client = client
         self.base_url = "https://ticketingweb.passo.com.tr/api/passoweb"
-        self.web_url = "https://www.passo.com.tr"
+        self.web_url = WEB_URL
         self.headers = {
             'Accept': 'application/json, text/plain, */*',
             'Accept-Language': 'en-GB,en-US;q=0.9,en;q=0.8',
@@ -51,131 +87,193 @@ class PassoCrawler:
             'venueSeoUrl': 'volkswagen-arena-etkinlik-biletleri',
             'venueName': 'Volkswagen Arena'
         }
-        return [(venue_data['venueID'], venue_data['venueSeoUrl'], venue_data['venueName'])]
+        venues = [(venue_data['venueID'], venue_data['venueSeoUrl'], venue_data['venueName'])]
+        # Further venues are configured as a JSON list of [id, seo_url, name]
+        venues += [tuple(venue) for venue in app.config['PASSO_VENUES'] if venue[0] != venue_data['venueID']]
+        return venues
 
-    def get_venue_details(self, venue_seo_url: str, venue_id: str, culture_id: str = "118") -> Dict:
+    async def get_venue_details(self, venue_seo_url: str, venue_id: str, culture_id: str = "118") -> Dict:
         """Get venue details including events"""
         url = f"{self.base_url}/getvenuedetails/{venue_seo_url}/{venue_id}/{culture_id}"
-        response = requests.get(url, headers=self.headers)
-        return response.json()
+        return await self.client.get_json(url, headers=self.headers, endpoint='getvenuedetails')
 
-    def get_event_details(self, event_seo_url: str, event_id: str, culture_id: str = "118") -> Dict:
+    async def get_event_details(self, event_seo_url: str, event_id: str, culture_id: str = "118") -> Dict:
         """Get detailed information about a specific event"""
         url = f"{self.base_url}/geteventdetails/{event_seo_url}/{event_id}/{culture_id}"
-        response = requests.get(url, headers=self.headers)
-        return response.json()
+        return await self.client.get_json(url, headers=self.headers, endpoint='geteventdetails')
 
-    def parse_event(self, event_data: Dict) -> Dict:
+    def parse_event(self, event_data: Dict, event_id: Optional[str] = None, venue: Optional[Dict] = None) -> Dict:
         """Parse event data into the format matching our Events model"""
-        value = event_data.get('value', {})
+        return parse_event(event_data, event_id, venue)
 
-        # Extract ticket categories/prices
-        ticket_sites_data = [
-            {
-                'name': category.get('name', ''),
-                'price': category.get('price', 0.0),
-                'url': f"{self.web_url}/tr/{value.get('seoUrl', '')}"
-            }
-            for category in value.get('categories', [])
-        ]
 
-        # Parse description and remove HTML tags
-        description = value.get('detailPageDescription', '').replace('<p>', '').replace('</p>', '\n')
-
-        # Create event data
-        event_data = {
-            'name': value.get('name', ''),
-            'type': value.get('genreName', ''),
-            'genre': value.get('subGenreName', ''),
-            'location': value.get('venueName', ''),
-            'time': value.get('date', ''),
-            'image_url': value.get('detailPageImageName', ''),
-            'description': description,
-            'director': '',  # Not available in the API
-            'cast': [],  # Not available in the API
-            'duration': f"{value.get('endDate', '')} - {value.get('date', '')}" if value.get('endDate') else '',
-            'rating': 0.0,  # Not available in the API
-            'favorite': False,
-            'ticket_sites_data': ticket_sites_data
+def parse_venue(venue: Dict, details: Dict) -> Optional[Dict]:
+    """venue_data of a venue from the value of its getvenuedetails response"""
+    return venue_data(
+        venue['id'], details.get('name') or venue['name'], details.get('cityName'),
+        coordinate(details, 'latitude'), coordinate(details, 'longitude'),
+    )
+
+
+def parse_event(event_data: Dict, event_id: Optional[str] = None, venue: Optional[Dict] = None) -> Dict:
+    """Parse event data into the format matching our Events model.
+
+    venue is the venue_data parse_venue read from the venue details; event
+    details carry no venue coordinates.
+    """
+    value = event_data.get('value', {})
+
+    # Extract ticket categories/prices
+    ticket_sites_data = [
+        {
+            'name': category.get('name', ''),
+            'price': category.get('price', 0.0),
+            'url': f"{WEB_URL}/tr/{value.get('seoUrl', '')}"
         }
+        for category in value.get('categories', [])
+    ]
 
-        return event_data
+    # Parse description and remove HTML tags
+    description = value.get('detailPageDescription', '').replace('<p>', '').replace('</p>', '\n')
 
-    async def save_event(self, event_data: Dict):
-        """Save event and its ticket sites to database"""
-        # Extract ticket sites data before removing it from event_data
-        ticket_sites_data = event_data.pop('ticket_sites_data', [])
+    # Create event data
+    event_data = {
+        'external_id': event_id or str(value.get('id', '')),
+        'name': value.get('name', ''),
+        'type': value.get('genreName', ''),
+        'genre': value.get('subGenreName', ''),
+        'location': value.get('venueName', ''),
+        'time': parse_event_time(value.get('date', '')),
+        'end_time': parse_event_time(value['endDate']) if value.get('endDate') else None,
+        'image_url': value.get('detailPageImageName', ''),
+        'description': description,
+        'director': '',  # Not available in the API
+        'cast': [],  # Not available in the API
+        'duration': f"{value.get('endDate', '')} - {value.get('date', '')}" if value.get('endDate') else '',
+        'rating': 0.0,  # Not available in the API
+        'venue_data': venue if venue is not None else venue_data(
+            value.get('venueId'), value.get('venueName', ''), value.get('cityName'), None, None,
+        ),
+        'ticket_sites_data': ticket_sites_data
+    }
 
-        # Create or update event
-        try:
+    return event_data
 
-            event, created = await Events.get_or_create(
-                defaults=event_data
-            )
-        except Exception as e:
-            print(f"Error saving event {event_data['name']}: {str(e)}")
-            return
-        if not created:
-            await event.update_from_dict(event_data).save()
-
-        # Create or update ticket sites
-        for ticket_data in ticket_sites_data:
-            await TicketSites.get_or_create(
-                event=event,
-                name=ticket_data['name'],
-                defaults={
-                    'price': ticket_data['price'],
-                    'url': ticket_data['url']
-                }
-            )
-
-    async def crawl_venue(self, venue: Dict):
-        """Crawl all events from a venue"""
+
+class PassoSource(SourceAdapter):
+    source = 'passo'
+    parse = staticmethod(parse_event)
+
+    def __init__(self, crawler: PassoCrawler, venue_concurrency: int = 8):
+        self.crawler = crawler
+        self.venue_concurrency = venue_concurrency
+        self.progress: Dict[int, VenueProgress] = {}
+
+    async def _venue_events(self, venue: Dict) -> Tuple[Optional[Dict], List[Dict]]:
+        """The venue_data and the events of a venue"""
         try:
             # Get venue details with all events
-            venue_data = self.get_venue_details(venue['seo_url'], str(venue['id']))
+            venue_data = await self.crawler.get_venue_details(venue['seo_url'], str(venue['id']))
+        except Exception as e:
+            log('crawl_error', logging.WARNING, source=self.source, stage='venue', venue=venue['name'],
+                error=type(e).__name__, message=str(e))
+            self.complete = False
+            return None, []
 
-            if venue_data.get('isError'):
-                print(f"Error fetching venue data for {venue['name']}: {venue_data}")
-                return
+        if venue_data.get('isError'):
+            log('crawl_error', logging.WARNING, source=self.source, stage='venue', venue=venue['name'],
+                error='VenueError', message=str(venue_data))
+            self.complete = False
+            return None, []
 
-            # Process each event
-            for event in venue_data.get('value', {}).get('venueEvents', []):
-                try:
-                    # Get detailed event information
-                    event_details = self.get_event_details(
-                        event['seoUrl'],
-                        str(event['id'])
-                    )
+        details = venue_data.get('value', {})
+        location = parse_venue(venue, details)
+        if location is not None and (location['latitude'] is None or location['longitude'] is None):
+            # The venue's events are still crawled, but /events/nearby can't find them
+            CRAWLER_ERRORS.labels(self.source, 'venue', 'VenueLocationMissing').inc()
+            log('crawl_error', logging.ERROR, source=self.source, stage='venue', venue=venue['name'],
+                error='VenueLocationMissing', message='Venue details have no latitude and longitude')
+        return location, details.get('venueEvents', [])
 
-                    if event_details.get('isError'):
-                        print(f"Error fetching event {event['id']}: {event_details}")
-                        continue
+    async def listings(self):
+        venues = self.crawler.get_venues()
 
-                    # Parse and save event data
-                    event_data = self.parse_event(event_details)
-                    await self.save_event(event_data)
-                    print(f"Successfully processed event: {event['name']}")
+        # Venue details are fetched a window at a time; the pipeline's bounded
+        # fetch queue holds back the next window until events are consumed
+        for start in range(0, len(venues), self.venue_concurrency):
+            window = venues[start:start + self.venue_concurrency]
+            for venue, (location, events) in zip(window, await asyncio.gather(*map(self._venue_events, window))):
+                venue = {**venue, 'venue_data': location}
+                log('venue_listed', source=self.source, venue=venue['name'], events=len(events))
+                progress = self.progress[venue['id']] = VenueProgress(venue['name'], total=len(events))
+                if progress.done:
+                    log('venue_finished', source=self.source, **progress.log_fields())
+                for event in events:
+                    yield venue, event
 
-                except Exception as e:
-                    print(f"Error processing event {event['id']}: {str(e)}")
+    def external_id(self, listing):
+        venue, event = listing
+        return str(event['id'])
 
-        except Exception as e:
-            print(f"Error processing venue {venue['name']}: {str(e)}")
+    def listing_data(self, listing):
+        venue, event = listing
+        return event
+
+    async def fetch(self, listing):
+        venue, event = listing
+        # Get detailed event information
+        event_details = await self.crawler.get_event_details(event['seoUrl'], str(event['id']))
+        if event_details.get('isError'):
+            raise CrawlError(f"Error fetching event {event['id']}: {event_details}")
+        return event_details, str(event['id']), venue['venue_data']
+
+    def done(self, listing, succeeded):
+        venue, event = listing
+        progress = self.progress[venue['id']]
+        if succeeded:
+            progress.succeeded += 1
+        else:
+            progress.failed += 1
+        if progress.done:
+            log('venue_finished', source=self.source, **progress.log_fields())
+
+
+async def crawl(full: bool = False, replay: bool = False) -> EventWriter:
+    """Crawl every known venue and return the writer with its counts.
+
+    With replay set, every response comes from the response store and the
+    whole crawl is re-parsed and re-written without touching the network.
+    The replayed prices are not added to the price history, they are not
+    current observations.
 
-    async def crawl_all(self):
-        """Crawl all venues and their events"""
-        venues = self.get_venues()
-        for venue in venues:
-            print(f"Crawling venue: {venue['name']}")
-            await self.crawl_venue(venue)
+    Raises CrawlLocked while another process crawls the same source.
+    """
+    async with crawl_lock('passo'):
+        async with HttpClient(
+            concurrency=app.config['CRAWLER_CONCURRENCY'],
+            rate_per_host=app.config['CRAWLER_RATE_PER_HOST'],
+            store=configured_store(app.config),
+            replay=replay,
+        ) as client, EventWriter(
+            'passo', app.config['CRAWLER_BATCH_SIZE'], incremental=not (full or replay), observe_prices=not replay
+        ) as writer:
+            with ProcessPoolExecutor(app.config['CRAWLER_PARSE_WORKERS']) as executor:
+                source = PassoSource(PassoCrawler(client), venue_concurrency=app.config['CRAWLER_CONCURRENCY'])
+                await Pipeline(
+                    source, writer, executor,
+                    fetch_workers=app.config['CRAWLER_CONCURRENCY'],
+                    parse_workers=app.config['CRAWLER_PARSE_WORKERS'],
+                ).run()
+    return writer
 
 
-async def main():
+async def main(full: bool = False, replay: bool = False):
     await init_tortoise()
-    crawler = PassoCrawler()
-    await crawler.crawl_all()
+    try:
+        await crawl(full, replay)
+    except CrawlLocked:
+        log('crawl_skipped', source='passo', reason='another crawl is running')
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main('--full' in sys.argv, '--replay' in sys.argv))
@@ -0,0 +1,215 @@
+""" Batched, incremental persistence of crawled events """
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tortoise import timezone
+from tortoise.transactions import in_transaction
+
+from app.cache import notify_events_changed
+from app.dedup import event_date, name_key, promote_canonicals, resolve_duplicates
+from app.genres import link_genres, split_genres
+from app.listings import refresh_listings
+from app.metrics import CRAWLER_ERRORS, CRAWLER_STAGE_SECONDS, log
+from app.models import Events, TicketSites
+from app.prices import ensure_partitions, record_prices
+from app.venues import upsert_venues
+
+# Fields refreshed when a crawled event already exists
+EVENT_UPDATE_FIELDS = [
+    'name', 'type', 'genre', 'location', 'time', 'end_time', 'image_url', 'description',
+    'director', 'cast', 'duration', 'rating', 'content_hash', 'last_seen_at', 'is_active', 'venue_id',
+    'event_date', 'name_key',
+]
+# Keys of parsed event data that are written to other tables
+RELATED_KEYS = ('ticket_sites_data', 'venue_data')
+TICKET_SITE_UPDATE_FIELDS = ['price', 'url']
+
+# Called with True once an event's batch is committed, False when it failed
+OnDone = Callable[[bool], None]
+
+
+def fingerprint(listing: Dict) -> str:
+    """Stable hash of the listing-level data a source returns for an event"""
+    return hashlib.sha256(json.dumps(listing, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class EventWriter:
+    """Buffers parsed events of one source and upserts them in batches.
+
+    Events are keyed on (source, external_id) and ticket sites on
+    (event_id, name), so re-crawling an event updates it in place. Each
+    batch is written in one transaction with one INSERT ... ON CONFLICT
+    DO UPDATE per table.
+
+    In incremental mode the crawler checks is_unchanged() with the listing
+    fingerprint before fetching details, and only touch()es events whose
+    fingerprint matches the stored one. Events of the source that were not
+    seen during a complete crawl are deactivated by finish().
+
+    Ticket prices are appended to the price history as observed now, so
+    replays of stored responses turn observe_prices off.
+
+    add() and touch() take an on_done callback, called with whether the
+    event was committed once its batch is written or has failed. Flushes
+    run one at a time. A failed batch is logged and its events reported
+    as failed; finish() then skips deactivation, since those events were
+    not marked as seen.
+    """
+
+    def __init__(self, source: str, batch_size: int = 100, incremental: bool = True, observe_prices: bool = True):
+        self.source = source
+        self.batch_size = batch_size
+        self.incremental = incremental
+        self.observe_prices = observe_prices
+        self.started_at: Optional[datetime] = None
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self._fingerprints: Dict[str, str] = {}
+        self._buffer: List[Tuple[Dict, Optional[OnDone]]] = []
+        self._touched: List[Tuple[str, Optional[OnDone]]] = []
+        self._flush_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        self.started_at = timezone.now()
+        await ensure_partitions()
+        if self.incremental:
+            rows = await Events.filter(source=self.source, is_active=True).values_list('external_id', 'content_hash')
+            self._fingerprints = dict(rows)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.flush()
+
+    def is_unchanged(self, external_id: str, content_hash: str) -> bool:
+        return self.incremental and self._fingerprints.get(external_id) == content_hash
+
+    async def touch(self, external_id: str, on_done: Optional[OnDone] = None):
+        """Mark an unchanged event as seen without rewriting it"""
+        self._touched.append((external_id, on_done))
+        if len(self._touched) >= self.batch_size:
+            await self.flush()
+
+    async def add(self, event_data: Dict, on_done: Optional[OnDone] = None):
+        self._buffer.append((event_data, on_done))
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            # Swap the buffers first so events added while this batch is written go to the next one
+            batch, self._buffer = self._buffer, []
+            touched, self._touched = self._touched, []
+            if not batch and not touched:
+                return
+
+            callbacks = [on_done for _, on_done in batch + touched if on_done is not None]
+            try:
+                if touched:
+                    await Events.filter(
+                        source=self.source, external_id__in=[external_id for external_id, _ in touched]
+                    ).update(last_seen_at=timezone.now())
+                if batch:
+                    await self._write_batch([event_data for event_data, _ in batch])
+            except Exception as e:
+                self.failed += len(batch) + len(touched)
+                CRAWLER_ERRORS.labels(self.source, 'write_batch', type(e).__name__).inc()
+                log('crawl_error', logging.ERROR, source=self.source, stage='write_batch',
+                    events=len(batch), touched=len(touched), error=type(e).__name__, message=str(e))
+                for on_done in callbacks:
+                    on_done(False)
+                return
+
+            self.written += len(batch)
+            self.skipped += len(touched)
+            for on_done in callbacks:
+                on_done(True)
+
+    async def _write_batch(self, batch: List[Dict]):
+        started = time.perf_counter()
+        # Later duplicates of the same event within a batch win
+        batch = list({data['external_id']: data for data in batch}.values())
+        now = timezone.now()
+        external_ids = [data['external_id'] for data in batch]
+
+        async with in_transaction() as connection:
+            # Updated events only change the cached pages they are on, new ones can land on any page
+            known = await Events.filter(
+                source=self.source, external_id__in=external_ids, is_active=True
+            ).using_db(connection).count()
+
+            venue_ids = await upsert_venues(
+                self.source, [data['venue_data'] for data in batch if data.get('venue_data')], using_db=connection
+            )
+
+            await Events.bulk_create(
+                [Events(**{key: value for key, value in data.items() if key not in RELATED_KEYS},
+                        venue_id=venue_ids.get((data.get('venue_data') or {}).get('external_id')),
+                        event_date=event_date(data['time']), name_key=name_key(data['name']),
+                        source=self.source, last_seen_at=now, is_active=True)
+                 for data in batch],
+                on_conflict=['source', 'external_id'],
+                update_fields=EVENT_UPDATE_FIELDS,
+                using_db=connection,
+            )
+
+            event_ids = dict(await Events.filter(
+                source=self.source, external_id__in=external_ids,
+            ).using_db(connection).values_list('external_id', 'id'))
+
+            await link_genres(
+                {event_ids[data['external_id']]: split_genres(data['genre']) for data in batch},
+                using_db=connection,
+            )
+
+            ticket_sites = {}
+            for data in batch:
+                event_id = event_ids[data['external_id']]
+                for ticket_data in data.get('ticket_sites_data', []):
+                    ticket_sites[(event_id, ticket_data['name'])] = TicketSites(event_id=event_id, **ticket_data)
+
+            if ticket_sites:
+                await TicketSites.bulk_create(
+                    list(ticket_sites.values()),
+                    on_conflict=['event_id', 'name'],
+                    update_fields=TICKET_SITE_UPDATE_FIELDS,
+                    using_db=connection,
+                )
+                if self.observe_prices:
+                    await record_prices(
+                        [(ticket.event_id, ticket.name, ticket.price) for ticket in ticket_sites.values()],
+                        using_db=connection,
+                    )
+
+            # Canonical events list the ticket sites of their whole group
+            refresh_ids = await resolve_duplicates(event_ids.values(), using_db=connection)
+
+        changed_ids = refresh_ids | set(event_ids.values())
+        await refresh_listings(changed_ids)
+        await notify_events_changed(changed_ids if known == len(batch) else None)
+        CRAWLER_STAGE_SECONDS.labels(self.source, 'write_batch').observe(time.perf_counter() - started)
+
+    async def finish(self, complete: bool = True):
+        """Flush and, after a complete crawl, deactivate events that were not seen"""
+        await self.flush()
+        if not complete or self.failed:
+            return
+
+        deactivated_ids = await Events.filter(
+            source=self.source, is_active=True, last_seen_at__lt=self.started_at
+        ).values_list('id', flat=True)
+        deactivated = len(deactivated_ids)
+        if deactivated:
+            await Events.filter(id__in=deactivated_ids).update(is_active=False)
+            await refresh_listings(await promote_canonicals(deactivated_ids))
+            await notify_events_changed()
+
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        log('crawl_finished', source=self.source, written=self.written, unchanged=self.skipped,
+            deactivated=deactivated, seconds=round(elapsed, 1),
+            events_per_second=round((self.written + self.skipped) / elapsed, 1) if elapsed else None)
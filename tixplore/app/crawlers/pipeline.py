@@ -0,0 +1,154 @@
+""" Streaming crawl pipeline: fetch, parse and persist stages joined by bounded queues """
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from app.crawlers.persistence import EventWriter, fingerprint
+from app.metrics import CRAWLER_ERRORS, CRAWLER_EVENTS, CRAWLER_STAGE_SECONDS, log
+
+
+class CrawlError(Exception):
+    pass
+
+
+class SourceAdapter(ABC):
+    """A crawler source plugged into Pipeline.
+
+    listings() yields lightweight listing entries, fetch() downloads what
+    parse needs for one entry, and parse turns that into event data for
+    EventWriter. parse runs in a process pool, so it must be a picklable
+    module-level function.
+    """
+    source: str
+    parse: Callable[..., Dict]
+    # Adapters clear this when listing discovery was partial
+    complete = True
+
+    @abstractmethod
+    def listings(self) -> AsyncIterator[Any]:
+        ...
+
+    @abstractmethod
+    def external_id(self, listing) -> str:
+        ...
+
+    def listing_data(self, listing) -> Dict:
+        """The part of a listing entry that is fingerprinted"""
+        return listing
+
+    @abstractmethod
+    async def fetch(self, listing) -> tuple:
+        """Return the arguments for parse, or raise CrawlError"""
+
+    def done(self, listing, succeeded: bool):
+        """Called once per listing entry after it was persisted, skipped or failed"""
+
+
+@dataclass
+class Item:
+    listing: Any
+    external_id: str
+    content_hash: str
+    fetched: Optional[tuple] = None
+    event_data: Optional[Dict] = None
+
+
+class Pipeline:
+    """Runs a source through fetch, parse and persist stages.
+
+    Every queue is bounded, so a slow stage blocks the ones before it and
+    only about queue_size items per stage are held in memory at once.
+    """
+
+    def __init__(self, adapter: SourceAdapter, writer: EventWriter, executor: Optional[Executor] = None,
+                 fetch_workers: int = 8, parse_workers: int = 2, queue_size: int = 32):
+        self.adapter = adapter
+        self.writer = writer
+        self.executor = executor
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        # Cleared on any failure, so a partial crawl never deactivates events
+        self.complete = True
+
+    async def _fetch(self, item: Item):
+        item.fetched = await self.adapter.fetch(item.listing)
+
+    async def _parse(self, item: Item):
+        loop = asyncio.get_running_loop()
+        item.event_data = await loop.run_in_executor(self.executor, self.adapter.parse, *item.fetched)
+        item.fetched = None
+        item.event_data['content_hash'] = item.content_hash
+
+    def _on_done(self, listing, outcome: str):
+        """Writer callback reporting a listing entry once its batch is committed or failed"""
+        def on_done(succeeded: bool):
+            CRAWLER_EVENTS.labels(self.adapter.source, outcome if succeeded else 'failed').inc()
+            if not succeeded:
+                self.complete = False
+            self.adapter.done(listing, succeeded)
+        return on_done
+
+    async def _persist(self, item: Item):
+        await self.writer.add(item.event_data, self._on_done(item.listing, 'written'))
+
+    async def _stage(self, stage: str, handler, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        source = self.adapter.source
+        while True:
+            item = await inbox.get()
+            try:
+                started = time.perf_counter()
+                await handler(item)
+                CRAWLER_STAGE_SECONDS.labels(source, stage).observe(time.perf_counter() - started)
+                if outbox is not None:
+                    await outbox.put(item)
+            except Exception as e:
+                CRAWLER_ERRORS.labels(source, stage, type(e).__name__).inc()
+                CRAWLER_EVENTS.labels(source, 'failed').inc()
+                log('crawl_error', logging.WARNING, source=source, stage=stage, external_id=item.external_id,
+                    error=type(e).__name__, message=str(e))
+                self.complete = False
+                self.adapter.done(item.listing, False)
+            finally:
+                inbox.task_done()
+
+    async def run(self):
+        fetch_queue = asyncio.Queue(maxsize=self.queue_size)
+        parse_queue = asyncio.Queue(maxsize=self.queue_size)
+        persist_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        workers = [asyncio.create_task(self._stage('fetch', self._fetch, fetch_queue, parse_queue))
+                   for _ in range(self.fetch_workers)]
+        workers += [asyncio.create_task(self._stage('parse', self._parse, parse_queue, persist_queue))
+                    for _ in range(self.parse_workers)]
+        # A single persist worker keeps the events in crawl order; the
+        # writer serializes its flushes with the listing producer's touches
+        workers.append(asyncio.create_task(self._stage('persist', self._persist, persist_queue, None)))
+
+        try:
+            async for listing in self.adapter.listings():
+                external_id = self.adapter.external_id(listing)
+                content_hash = fingerprint(self.adapter.listing_data(listing))
+                if self.writer.is_unchanged(external_id, content_hash):
+                    await self.writer.touch(external_id, self._on_done(listing, 'unchanged'))
+                else:
+                    await fetch_queue.put(Item(listing, external_id, content_hash))
+        except Exception as e:
+            CRAWLER_ERRORS.labels(self.adapter.source, 'listing', type(e).__name__).inc()
+            log('crawl_error', logging.WARNING, source=self.adapter.source, stage='listing',
+                error=type(e).__name__, message=str(e))
+            self.complete = False
+
+        await fetch_queue.join()
+        await parse_queue.join()
+        await persist_queue.join()
+
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        await self.writer.finish(self.complete and self.adapter.complete)
@@ -0,0 +1,87 @@
+""" On-disk store of raw crawler responses for conditional requests and offline replay """
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+# Request headers that change the response and so are part of the request key
+VARYING_HEADERS = ('ilid',)
+
+
+class ReplayMiss(LookupError):
+    """A replayed crawl asked for a response the store does not have"""
+
+
+def configured_store(config) -> Optional['ResponseStore']:
+    """The store under CRAWLER_CACHE_DIR, or None when responses are not kept"""
+    directory = config['CRAWLER_CACHE_DIR']
+    return ResponseStore(directory) if directory else None
+
+
+class ResponseStore:
+    """Content-addressed, gzip-compressed response bodies plus a per-request index.
+
+    objects/ holds each distinct body once, named by its SHA-256. index/
+    maps a request (URL and varying headers) to the digest of its latest
+    body along with the ETag and Last-Modified the server sent, which the
+    next live request sends back as If-None-Match / If-Modified-Since.
+    Files are written to a temporary name and renamed, so concurrent
+    crawlers never read a partial file.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def request_key(url: str, headers: Optional[Dict] = None) -> str:
+        varying = sorted((name, str(value)) for name, value in (headers or {}).items()
+                         if name.lower() in VARYING_HEADERS)
+        return hashlib.sha256(json.dumps([url, varying]).encode('utf-8')).hexdigest()
+
+    def _path(self, kind: str, name: str) -> str:
+        return os.path.join(self.directory, kind, name[:2], name)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def _load(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        try:
+            with open(self._path('index', key), 'rb') as file:
+                entry = json.load(file)
+            with open(self._path('objects', entry['digest']), 'rb') as file:
+                return entry, gzip.decompress(file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save(self, key: str, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> Dict:
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._path('objects', digest)
+        if not os.path.exists(object_path):
+            self._write(object_path, gzip.compress(body))
+        entry = {
+            'url': url,
+            'digest': digest,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+        }
+        self._write(self._path('index', key), json.dumps(entry).encode('utf-8'))
+        return entry
+
+    # File access runs in a thread so a crawl's event loop never waits on the disk
+
+    async def load(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        """(index entry, body) of the latest stored response of a request, or None"""
+        return await asyncio.to_thread(self._load, key)
+
+    async def save(self, key: str, url: str, body: bytes, etag: Optional[str] = None,
+                   last_modified: Optional[str] = None) -> Dict:
+        return await asyncio.to_thread(self._save, key, url, body, etag, last_modified)
@@ -0,0 +1,99 @@
+"""
+Long-running crawl scheduler.
+
+Every source is crawled in its own loop, so a source never has two crawls
+running in this process. The crawl() of every crawler takes a Postgres
+advisory lock (app.crawlers.locks), which extends that guarantee to other
+scheduler processes and manual crawler runs. The wait between crawls
+starts at the source's configured interval, adapts to how much changed in
+the last crawl and is jittered so the sources do not hit their APIs or our
+database in lockstep. With CRAWLER_METRICS_PORT set, the crawler metrics
+of app.metrics are served on that port for Prometheus.
+
+    python -m app.crawlers.scheduler
+"""
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from prometheus_client import start_http_server
+
+from app import app, init_tortoise
+from app.crawlers import bubilet_crawler, passo_crawler
+from app.crawlers.locks import CrawlLocked
+from app.crawlers.persistence import EventWriter
+from app.metrics import log
+
+# Bounds on how far the adaptive interval may drift from the configured one
+MIN_INTERVAL_FACTOR = 0.25
+MAX_INTERVAL_FACTOR = 4
+
+
+@dataclass
+class ScheduledSource:
+    name: str
+    crawl: Callable[[], Awaitable[EventWriter]]
+    base_interval: float
+    interval: float = 0
+
+    def __post_init__(self):
+        self.interval = self.interval or self.base_interval
+
+    def adapt(self, writer: EventWriter):
+        """Crawl sooner when much of the source changed, later when almost nothing did"""
+        seen = writer.written + writer.skipped
+        if not seen:
+            return
+        change_ratio = writer.written / seen
+        if change_ratio > 0.3:
+            self.interval /= 2
+        elif change_ratio < 0.05:
+            self.interval *= 1.5
+        self.interval = min(max(self.interval, self.base_interval * MIN_INTERVAL_FACTOR),
+                            self.base_interval * MAX_INTERVAL_FACTOR)
+
+    def next_delay(self, jitter: float) -> float:
+        return self.interval * random.uniform(1 - jitter, 1 + jitter)
+
+
+async def run_locked(source: ScheduledSource):
+    """Run one crawl of source unless another process is already crawling it"""
+    try:
+        writer = await source.crawl()
+    except CrawlLocked:
+        log('crawl_skipped', source=source.name, reason='another crawl is running')
+        return
+    source.adapt(writer)
+
+
+async def run_source(source: ScheduledSource, jitter: float):
+    # Stagger the first crawls as well
+    await asyncio.sleep(random.uniform(0, source.interval * jitter))
+    while True:
+        try:
+            await run_locked(source)
+        except Exception as e:
+            log('crawl_error', logging.ERROR, source=source.name, stage='crawl', error=type(e).__name__, message=str(e))
+
+        delay = source.next_delay(jitter)
+        log('crawl_scheduled', source=source.name, delay_seconds=round(delay))
+        await asyncio.sleep(delay)
+
+
+async def main():
+    await init_tortoise()
+    if app.config['CRAWLER_METRICS_PORT']:
+        start_http_server(app.config['CRAWLER_METRICS_PORT'])
+
+    intervals = app.config['CRAWLER_INTERVALS']
+    sources = [
+        ScheduledSource('bubilet', bubilet_crawler.crawl, intervals['bubilet']),
+        ScheduledSource('passo', passo_crawler.crawl, intervals['passo']),
+    ]
+    await asyncio.gather(*(run_source(source, app.config['CRAWLER_INTERVAL_JITTER']) for source in sources))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,11 +1,102 @@
-TORTOISE_ORM = {
-    "connections": {
-        "default": "postgres://postgres@localhost:5432/tixplore"
-    },
-    "apps": {
-        "models": {
-            "models": ["app.models", "aerich.models"],
-            "default_connection": "default",
+""" Tortoise connection settings shared by the app, the crawlers and aerich """
+from typing import Dict
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.backends.base.config_generator import expand_db_url
+
+from .metrics import install_query_logger
+
+REPLICA = 'replica'
+
+
+def _connection(url: str, min_size: int, max_size: int, statement_timeout: int, application_name: str) -> dict:
+    connection = expand_db_url(url)
+    connection['credentials'].update({
+        'minsize': min_size,
+        'maxsize': max_size,
+        'server_settings': {
+            # Milliseconds, 0 disables the timeout
+            'statement_timeout': str(statement_timeout),
+            'application_name': application_name,
         },
-    },
-}
+        # Passed on to asyncpg.create_pool; counts queries per API request
+        'init': install_query_logger,
+    })
+    return connection
+
+
+def tortoise_config(config, role: str = 'api') -> dict:
+    """Tortoise config for the API server ('api') or for crawlers and batch jobs ('crawler').
+
+    Crawlers get their own, smaller pool with a longer statement timeout
+    so a bulk ingest can't hold the connections the API needs, and the
+    application_name lets Postgres tell the two apart. Only the API
+    routes reads to the replica.
+    """
+    if role == 'crawler':
+        connections_config = {
+            'default': _connection(
+                config['DATABASE_URI'], config['CRAWLER_DB_POOL_MIN'], config['CRAWLER_DB_POOL_MAX'],
+                config['CRAWLER_STATEMENT_TIMEOUT'], 'tixplore-crawler'
+            ),
+        }
+    else:
+        connections_config = {
+            'default': _connection(
+                config['DATABASE_URI'], config['DB_POOL_MIN'], config['DB_POOL_MAX'],
+                config['DB_STATEMENT_TIMEOUT'], 'tixplore-api'
+            ),
+        }
+        if config['DATABASE_REPLICA_URI']:
+            connections_config[REPLICA] = _connection(
+                config['DATABASE_REPLICA_URI'], config['DB_POOL_MIN'], config['DB_POOL_MAX'],
+                config['DB_STATEMENT_TIMEOUT'], 'tixplore-api'
+            )
+
+    return {
+        "connections": connections_config,
+        "apps": {
+            "models": {
+                "models": ["app.models", "aerich.models"],
+                "default_connection": "default",
+            },
+        },
+    }
+
+
+def read_connection() -> BaseDBAsyncClient:
+    """Connection for read-only listing queries: the replica when one is configured.
+
+    Replicas lag a little, so anything that has to see the current
+    user's own writes (favorites) keeps reading from the primary.
+    """
+    return connections.get(REPLICA if REPLICA in connections.db_config else 'default')
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Size and usage of every open connection pool, by connection name"""
+    stats = {}
+    for name in connections.db_config:
+        pool = getattr(connections.get(name), '_pool', None)
+        if pool is None:
+            continue
+        size = pool.get_size()
+        idle = pool.get_idle_size()
+        stats[name] = {
+            'min': pool.get_min_size(),
+            'max': pool.get_max_size(),
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+        }
+    return stats
+
+
+def __getattr__(name):
+    # aerich reads TORTOISE_ORM; it is built on first access because the
+    # API modules import this one before the app's config is loaded
+    if name == 'TORTOISE_ORM':
+        from app import app
+        return tortoise_config(app.config)
+    raise AttributeError(name)
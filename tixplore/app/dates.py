@@ -0,0 +1,21 @@
+""" Event date handling shared by the crawlers and the API """
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Sources publish local Turkish times, mostly without an offset
+EVENT_TIMEZONE_NAME = 'Europe/Istanbul'
+EVENT_TIMEZONE = ZoneInfo(EVENT_TIMEZONE_NAME)
+
+
+def parse_event_time(value: str) -> datetime:
+    """Parse an ISO date or datetime into an aware datetime, local time unless it has an offset"""
+    if not value:
+        raise ValueError('Missing event time')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=EVENT_TIMEZONE)
+    return parsed
+
+
+def start_of_today() -> datetime:
+    return datetime.now(EVENT_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
@@ -0,0 +1,187 @@
+""" Cross-source event deduplication.
+
+The same show listed by Bubilet and Passo is stored as one event per
+source. Each event is matched against events of the other sources, and a
+matching event points at the canonical event of its group through
+Events.canonical. Listing endpoints only return canonical events, and
+their listing rows carry the ticket sites of the whole group.
+
+Only events on the same local date are compared (the blocking key, the
+indexed Events.event_date column). Within a date, only events sharing a
+name token are scored. Each crawl batch is therefore resolved against
+a few candidates per event rather than against the whole table.
+"""
+from collections import defaultdict
+from datetime import date
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Set
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from .dates import EVENT_TIMEZONE
+from .models import Events
+from .text import text_key
+
+# Minimum weighted name/venue similarity for two events to be the same
+MATCH_THRESHOLD = 0.8
+NAME_WEIGHT = 0.75
+# Names must be at least this similar regardless of the venue
+MIN_NAME_SIMILARITY = 0.6
+# Two words at least this similar count as the same word
+MIN_WORD_SIMILARITY = 0.8
+_FIELDS = ('id', 'source', 'name_key', 'location', 'event_date', 'canonical_id')
+
+# Re-point duplicates of canonical events that were deactivated to the
+# lowest active member of their group
+PROMOTE_SQL = """
+    WITH promoted AS (
+        SELECT DISTINCT ON (m.canonical_id) m.canonical_id AS old_id, m.id AS new_id
+        FROM events m
+        JOIN events c ON c.id = m.canonical_id
+        WHERE m.is_active AND NOT c.is_active AND c.id = ANY($1::int[])
+        ORDER BY m.canonical_id, m.id
+    )
+    UPDATE events e
+    SET canonical_id = CASE WHEN e.id = p.new_id THEN NULL ELSE p.new_id END
+    FROM promoted p
+    WHERE e.canonical_id = p.old_id
+    RETURNING e.id
+"""
+
+
+def name_key(value: str) -> str:
+    """Lowercase, accent-free words of a name, so Kadıköy and KADIKOY compare equal"""
+    return text_key(value, fold_accents=True)
+
+
+def event_date(time) -> Optional[date]:
+    return time.astimezone(EVENT_TIMEZONE).date() if time is not None else None
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the words of two name keys, ignoring word order.
+
+    Words differing by a typo or a suffix (konser, konseri) count as shared.
+    Symmetric, so a name merely containing the other scores low: "Hamlet"
+    vs "Hamlet Müzikali" is 0.5.
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    a_words, b_words = set(a.split()), set(b.split())
+    shared = a_words & b_words
+    # Pair the remaining words most similar first, so the result doesn't depend on argument order
+    pairs = sorted(
+        (
+            (SequenceMatcher(None, a_word, b_word).ratio(), min(a_word, b_word), max(a_word, b_word), a_word, b_word)
+            for a_word in a_words - shared for b_word in b_words - shared
+        ),
+        reverse=True,
+    )
+    paired_a, paired_b = set(), set()
+    for ratio, _, _, a_word, b_word in pairs:
+        if ratio < MIN_WORD_SIMILARITY:
+            break
+        if a_word not in paired_a and b_word not in paired_b:
+            paired_a.add(a_word)
+            paired_b.add(b_word)
+    matched = len(shared) + len(paired_a)
+    return matched / (len(a_words) + len(b_words) - matched)
+
+
+def score(event: Dict, candidate: Dict) -> float:
+    name_score = similarity(event['name_key'], candidate['name_key'])
+    if name_score < MIN_NAME_SIMILARITY:
+        return 0.0
+    venue_score = similarity(name_key(event['location'] or ''), name_key(candidate['location'] or ''))
+    return NAME_WEIGHT * name_score + (1 - NAME_WEIGHT) * venue_score
+
+
+def best_match(event: Dict, candidates: Iterable[Dict]) -> Optional[Dict]:
+    best, best_score = None, MATCH_THRESHOLD
+    for candidate in candidates:
+        candidate_score = score(event, candidate)
+        if candidate_score >= best_score:
+            best, best_score = candidate, candidate_score
+    return best
+
+
+def _token_index(events: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    index = defaultdict(list)
+    for event in events:
+        for token in set((event['name_key'] or '').split()):
+            index[token].append(event)
+    return index
+
+
+async def resolve_duplicates(event_ids: Iterable[int], using_db: Optional[BaseDBAsyncClient] = None) -> Set[int]:
+    """Match the given events against events of other sources and update their canonical links.
+
+    Returns the canonical ids of every group touched, whose listing rows
+    need a refresh.
+    """
+    event_ids = list(event_ids)
+    if not event_ids:
+        return set()
+
+    events = await Events.filter(id__in=event_ids).using_db(using_db).values(*_FIELDS)
+    dates = {event['event_date'] for event in events if event['event_date'] is not None}
+    # Events of the batch are candidates for each other too, and their
+    # links are updated in place below so a pair can't point at each other
+    candidates = await Events.filter(
+        event_date__in=list(dates), is_active=True
+    ).using_db(using_db).values(*_FIELDS) if dates else []
+
+    blocks = defaultdict(list)
+    for candidate in candidates:
+        blocks[candidate['event_date']].append(candidate)
+    indexes = {day: _token_index(block) for day, block in blocks.items()}
+
+    affected = set()
+    for event in events:
+        index = indexes.get(event['event_date'], {})
+        seen, shortlist = set(), []
+        for token in set((event['name_key'] or '').split()):
+            for candidate in index.get(token, ()):
+                if candidate['source'] != event['source'] and candidate['id'] not in seen:
+                    seen.add(candidate['id'])
+                    shortlist.append(candidate)
+
+        match = best_match(event, shortlist)
+        canonical_id = (match['canonical_id'] or match['id']) if match is not None else None
+        if canonical_id == event['id']:
+            canonical_id = None
+
+        affected.add(canonical_id or event['id'])
+        if canonical_id == event['canonical_id']:
+            continue
+
+        affected.add(event['canonical_id'] or event['id'])
+        await Events.filter(id=event['id']).using_db(using_db).update(canonical_id=canonical_id)
+        if canonical_id is not None:
+            # Duplicates that pointed at this event follow it into the group
+            await Events.filter(canonical_id=event['id']).using_db(using_db).update(canonical_id=canonical_id)
+        for candidate in candidates:
+            if candidate['id'] == event['id'] or (canonical_id is not None and candidate['canonical_id'] == event['id']):
+                candidate['canonical_id'] = canonical_id
+
+    return affected
+
+
+async def promote_canonicals(deactivated_ids: Iterable[int]) -> Set[int]:
+    """Hand groups whose canonical event was deactivated over to an active member.
+
+    Returns the ids whose listing rows need a refresh.
+    """
+    deactivated_ids = list(deactivated_ids)
+    if not deactivated_ids:
+        return set()
+    _, rows = await connections.get('default').execute_query(PROMOTE_SQL, [deactivated_ids])
+    promoted = {row['id'] for row in rows}
+    # Groups whose deactivated member was not the canonical event lose its ticket sites
+    canonical_ids = await Events.filter(
+        id__in=deactivated_ids, canonical_id__not_isnull=True
+    ).values_list('canonical_id', flat=True)
+    return promoted | set(canonical_ids)
@@ -0,0 +1,41 @@
+""" Per-user favorite events """
+from typing import Iterable, Set, Tuple
+
+from tortoise.transactions import in_transaction
+
+from .cache import notify_events_changed
+from .models import Events, UserFavorites
+
+
+async def favorite_ids(user_id: int, event_ids: Iterable[int]) -> Set[int]:
+    """The subset of event_ids the user has favorited"""
+    event_ids = list(event_ids)
+    if not event_ids:
+        return set()
+    return set(await UserFavorites.filter(user_id=user_id, event_id__in=event_ids).values_list('event_id', flat=True))
+
+
+async def set_favorites(user_id: int, changes: Iterable[Tuple[int, bool]]) -> int:
+    """Apply (event_id, favorite) changes in one transaction and return how many events exist.
+
+    Unknown events are ignored. When an event appears more than once the
+    last change wins.
+    """
+    changes = dict(changes)
+    existing = set(await Events.filter(id__in=list(changes)).values_list('id', flat=True))
+    added = [event_id for event_id, favorite in changes.items() if favorite and event_id in existing]
+    removed = [event_id for event_id, favorite in changes.items() if not favorite and event_id in existing]
+
+    async with in_transaction() as connection:
+        if added:
+            await UserFavorites.bulk_create(
+                [UserFavorites(user_id=user_id, event_id=event_id) for event_id in added],
+                ignore_conflicts=True,
+                using_db=connection,
+            )
+        if removed:
+            await UserFavorites.filter(user_id=user_id, event_id__in=removed).using_db(connection).delete()
+
+    if existing:
+        await notify_events_changed(existing, paths=['/favorites'])
+    return len(existing)
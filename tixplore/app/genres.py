@@ -0,0 +1,64 @@
+""" Normalized event genres and the category to genre mapping """
+from typing import Dict, Iterable, List
+
+from tortoise.expressions import Subquery
+from tortoise.queryset import QuerySet
+
+from .databases import read_connection
+from .models import CategoryGenres, EventGenres, Genres
+from .text import text_key
+
+# Mapping the category_genres table starts with, see app.onetime.build_genres
+DEFAULT_CATEGORY_GENRES = {
+    'enerjik': ['macera'],
+    'romantik': ['romantik', 'Tiyatro'],
+    'eğlenceli': ['Stand Up'],
+}
+
+
+def genre_key(name: str) -> str:
+    return text_key(name)
+
+
+def split_genres(genre: str) -> List[str]:
+    """Genre names of a comma-joined Events.genre value"""
+    return [name.strip() for name in genre.split(',') if name.strip()] if genre else []
+
+
+async def category_exists(category: str) -> bool:
+    return await CategoryGenres.filter(category=category).using_db(read_connection()).exists()
+
+
+def filter_by_category(query: QuerySet, category: str) -> QuerySet:
+    """Restrict an Events query to the category through indexed joins on event_genres"""
+    genre_keys = CategoryGenres.filter(category=category).values('genre_key')
+    event_ids = EventGenres.filter(genre__key__in=Subquery(genre_keys)).values('event_id')
+    return query.filter(id__in=Subquery(event_ids))
+
+
+async def link_genres(genres_by_event: Dict[int, Iterable[str]], using_db=None):
+    """Replace the genres of the given events, creating missing genres"""
+    names = {}
+    for genre_names in genres_by_event.values():
+        for name in genre_names:
+            names.setdefault(genre_key(name), name)
+
+    if names:
+        await Genres.bulk_create(
+            [Genres(name=name, key=key) for key, name in names.items()],
+            ignore_conflicts=True,
+            using_db=using_db,
+        )
+    genre_ids = dict(await Genres.filter(key__in=list(names)).using_db(using_db).values_list('key', 'id'))
+
+    await EventGenres.filter(event_id__in=list(genres_by_event)).using_db(using_db).delete()
+    links = {
+        (event_id, genre_ids[genre_key(name)])
+        for event_id, genre_names in genres_by_event.items()
+        for name in genre_names
+    }
+    if links:
+        await EventGenres.bulk_create(
+            [EventGenres(event_id=event_id, genre_id=genre_id) for event_id, genre_id in links],
+            using_db=using_db,
+        )
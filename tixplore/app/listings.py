@@ -0,0 +1,81 @@
+""" Precomputed event listing rows served by the listing endpoints """
+from typing import Iterable, List, Optional, Set
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from .api.responses import EventOut
+from .dates import EVENT_TIMEZONE_NAME
+from .models import EventListings, Events
+
+PLACEHOLDER_IMAGE_URL = '/api/placeholder/800/400'
+
+# Builds the JSON-ready row of each event in one statement. The ticket sites
+# are those of the event and of its active duplicates, see app.dedup
+REFRESH_SQL = f"""
+    INSERT INTO event_listings (event_id, payload, min_price, updated_at)
+    SELECT
+        e.id,
+        jsonb_build_object(
+            'id', e.id::text,
+            'name', e.name,
+            'type', e.type,
+            'genre', CASE WHEN e.genre = '' THEN '[]'::jsonb ELSE to_jsonb(string_to_array(e.genre, ',')) END,
+            'location', e.location,
+            'time', to_char(e."time" AT TIME ZONE '{EVENT_TIMEZONE_NAME}', 'YYYY-MM-DD'),
+            'imageUrl', coalesce(nullif(e.image_url, ''), '{PLACEHOLDER_IMAGE_URL}'),
+            'description', e.description,
+            'director', e.director,
+            'cast', e."cast",
+            'duration', e.duration,
+            'rating', e.rating,
+            'ticket_sites', coalesce(sites.ticket_sites, '[]'::jsonb)
+        ),
+        sites.min_price,
+        now()
+    FROM events e
+    LEFT JOIN LATERAL (
+        SELECT
+            jsonb_agg(jsonb_build_object('name', t.name, 'price', t.price, 'url', t.url) ORDER BY t.id) AS ticket_sites,
+            min(t.price) AS min_price
+        FROM ticket_sites t
+        JOIN events m ON m.id = t.event_id
+        WHERE m.id = e.id OR (m.canonical_id = e.id AND m.is_active)
+    ) sites ON true
+    WHERE e.id = ANY($1::int[])
+    ON CONFLICT (event_id) DO UPDATE
+        SET payload = EXCLUDED.payload, min_price = EXCLUDED.min_price, updated_at = EXCLUDED.updated_at
+"""
+
+
+async def refresh_listings(event_ids: Iterable[int]):
+    """Rebuild the listing rows of the given events"""
+    event_ids = list(event_ids)
+    if event_ids:
+        await connections.get('default').execute_query(REFRESH_SQL, [event_ids])
+
+
+async def load_listings(
+        events: List[Events], favorite_ids: Set[int] = frozenset(), using_db: Optional[BaseDBAsyncClient] = None
+) -> List[EventOut]:
+    """Return the listing rows of events in order, building any that are missing.
+
+    Favorites are per user, so isFavorite is filled in from favorite_ids
+    rather than stored in the row. Rows are read through using_db (the
+    replica for public listings); missing rows are built and re-read on
+    the primary.
+    """
+    event_ids = [event.id for event in events]
+    if not event_ids:
+        return []
+
+    rows = dict(await EventListings.filter(event_id__in=event_ids).using_db(using_db).values_list('event_id', 'payload'))
+
+    missing = [event_id for event_id in event_ids if event_id not in rows]
+    if missing:
+        await refresh_listings(missing)
+        rows.update(await EventListings.filter(event_id__in=missing).values_list('event_id', 'payload'))
+
+    for event_id in event_ids:
+        rows[event_id]['isFavorite'] = event_id in favorite_ids
+    return [rows[event_id] for event_id in event_ids]
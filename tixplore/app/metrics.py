@@ -0,0 +1,127 @@
+""" Prometheus metrics and structured logs of the API and the crawlers """
+import json
+import logging
+import os
+import re
+import sys
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+logger = logging.getLogger('tixplore')
+
+# API
+
+REQUEST_SECONDS = Histogram(
+    'tixplore_request_duration_seconds', 'Time spent handling API requests',
+    ['route', 'method', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'tixplore_request_db_queries', 'Database queries issued per API request',
+    ['route'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+REQUEST_DB_SECONDS = Histogram(
+    'tixplore_request_db_seconds', 'Time spent in database queries per API request',
+    ['route'],
+)
+
+# Crawlers
+
+CRAWLER_HTTP_SECONDS = Histogram(
+    'tixplore_crawler_http_seconds', 'Latency of upstream API requests',
+    ['host', 'endpoint', 'status'],
+)
+CRAWLER_STAGE_SECONDS = Histogram(
+    'tixplore_crawler_stage_seconds', 'Time per event spent in each pipeline stage, and per batch write',
+    ['source', 'stage'],
+)
+CRAWLER_EVENTS = Counter(
+    'tixplore_crawler_events', 'Crawled events by outcome (written, unchanged or failed)',
+    ['source', 'outcome'],
+)
+CRAWLER_ERRORS = Counter(
+    'tixplore_crawler_errors', 'Crawler errors by stage and exception type',
+    ['source', 'stage', 'error'],
+)
+
+_DIGITS_RE = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_label(path: str) -> str:
+    """Path of an upstream URL with numeric ids folded, so every event shares one label"""
+    return _DIGITS_RE.sub('/:id', path)
+
+
+def log(event: str, level: int = logging.INFO, **fields):
+    """One JSON object per line, so logs can be filtered and aggregated by field"""
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({'event': event, **fields}, default=str, ensure_ascii=False))
+
+
+def configure_logging():
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(os.getenv('LOG_LEVEL', 'INFO'))
+        logger.propagate = False
+
+
+# Database queries of the current request. asyncpg runs query loggers with
+# the context of the task that issued the query, see databases._connection.
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+request_queries: ContextVar[Optional[QueryStats]] = ContextVar('request_queries', default=None)
+
+
+def record_query(record):
+    stats = request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += record.elapsed
+
+
+async def install_query_logger(connection):
+    """asyncpg pool init hook"""
+    connection.add_query_logger(record_query)
+
+
+class PoolCollector:
+    """Size and usage of the database pools of this process, read at scrape time"""
+
+    def collect(self):
+        from .databases import pool_stats
+
+        gauges = {
+            key: GaugeMetricFamily(f'tixplore_db_pool_{key}', f'Connections of the database pool ({key})',
+                                   labels=['connection'])
+            for key in ('max', 'size', 'idle', 'in_use')
+        }
+        for name, stats in pool_stats().items():
+            for key, gauge in gauges.items():
+                gauge.add_metric([name], stats[key])
+        return list(gauges.values())
+
+
+# Pool gauges describe the scraped process only, so they are kept out of
+# the multiprocess registry
+_pool_registry = CollectorRegistry()
+_pool_registry.register(PoolCollector())
+
+
+def render_metrics() -> bytes:
+    """Text exposition of every metric, merged across workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    registry = REGISTRY
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return generate_latest(registry) + generate_latest(_pool_registry)
@@ -13,14 +13,26 @@ class Base(Model):
 
 class Users(Base):
     id = fields.IntField(pk=True)
-    email = fields.CharField(max_length=255)
-    password = fields.CharField(max_length=255)
+    email = fields.CharField(max_length=255, unique=True)
+    password = fields.CharField(max_length=255)  # argon2 hash, see app.security.hash_password
     name = fields.CharField(max_length=255)
 
     class Meta:
         table = "users"
 
 
+class ApiKeys(Model):
+    id = fields.IntField(pk=True)
+    name = fields.CharField(max_length=100)
+    key_hash = fields.CharField(max_length=64, unique=True)  # See app.security.hash_api_key
+    is_active = fields.BooleanField(default=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    revoked_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "api_keys"
+
+
 class TicketSites(Model):
     id = fields.IntField(pk=True)
     name = fields.CharField(max_length=100)
@@ -30,6 +42,22 @@ class TicketSites(Model):
 
     class Meta:
         table = "ticket_sites"
+        unique_together = (("event", "name"),)
+
+
+class Venues(Model):
+    """A venue as a source reports it, located for the nearby search, see app.venues"""
+    id = fields.IntField(pk=True)
+    source = fields.CharField(max_length=20)
+    external_id = fields.CharField(max_length=100)  # Venue id on the source site, or its normalized name
+    name = fields.CharField(max_length=255)
+    city = fields.CharField(max_length=100, null=True)
+    latitude = fields.FloatField(null=True)
+    longitude = fields.FloatField(null=True)
+
+    class Meta:
+        table = "venues"
+        unique_together = (("source", "external_id"),)
 
 
 class Events(Model):
@@ -38,14 +66,81 @@ class Events(Model):
     type = fields.CharField(max_length=100)
     genre = fields.CharField(max_length=300)
     location = fields.CharField(max_length=255)
-    time = fields.CharField(max_length=40)
+    time = fields.DatetimeField()  # Start, or first session of a multi-session event
+    end_time = fields.DatetimeField(null=True)
     image_url = fields.CharField(max_length=255, null=True)
     description = fields.TextField()
     director = fields.CharField(max_length=100)
     cast = fields.JSONField()  # Storing list of actors as JSON
     duration = fields.CharField(max_length=50)
     rating = fields.FloatField()
-    favorite = fields.BooleanField(default=False)
+    source = fields.CharField(max_length=20, null=True)  # Crawler that found the event, e.g. bubilet or passo
+    external_id = fields.CharField(max_length=100, null=True)  # Event id on the source site
+    content_hash = fields.CharField(max_length=64, null=True)  # Fingerprint of the source listing entry
+    last_seen_at = fields.DatetimeField(null=True)
+    is_active = fields.BooleanField(default=True)
+    venue = fields.ForeignKeyField("models.Venues", related_name="events", null=True)
+    # Deduplication, see app.dedup: blocking date, normalized name and the
+    # event this one duplicates (null when it is canonical itself)
+    event_date = fields.DateField(null=True, index=True)
+    name_key = fields.CharField(max_length=255, null=True)
+    canonical = fields.ForeignKeyField("models.Events", related_name="duplicates", null=True, index=True)
 
     class Meta:
         table = "events"
+        unique_together = (("source", "external_id"),)
+        # The (time, id) listing index is partial (active events only), see app.onetime.event_time
+
+
+class UserFavorites(Model):
+    id = fields.IntField(pk=True)
+    user = fields.ForeignKeyField("models.Users", related_name="favorites")
+    event = fields.ForeignKeyField("models.Events", related_name="favorited_by")
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "user_favorites"
+        unique_together = (("user", "event"),)
+
+
+class Genres(Model):
+    id = fields.IntField(pk=True)
+    name = fields.CharField(max_length=100)
+    key = fields.CharField(max_length=100, unique=True)  # Normalized name, see app.genres.genre_key
+
+    class Meta:
+        table = "genres"
+
+
+class EventGenres(Model):
+    id = fields.IntField(pk=True)
+    event = fields.ForeignKeyField("models.Events", related_name="event_genres")
+    genre = fields.ForeignKeyField("models.Genres", related_name="event_genres")
+
+    class Meta:
+        table = "event_genres"
+        unique_together = (("event", "genre"),)
+        indexes = (("genre", "event"),)
+
+
+class CategoryGenres(Model):
+    """Maps a mood category of the app, e.g. romantik, to the genres it lists"""
+    id = fields.IntField(pk=True)
+    category = fields.CharField(max_length=50, index=True)
+    genre_key = fields.CharField(max_length=100)
+
+    class Meta:
+        table = "category_genres"
+        unique_together = (("category", "genre_key"),)
+
+
+class EventListings(Model):
+    """Denormalized, JSON-ready listing row of an event, rebuilt by app.listings.refresh_listings"""
+    id = fields.IntField(pk=True)
+    event = fields.OneToOneField("models.Events", related_name="listing")
+    payload = fields.JSONField()
+    min_price = fields.FloatField(null=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "event_listings"
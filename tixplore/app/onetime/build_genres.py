@@ -0,0 +1,35 @@
+"""
+Seeds the default category mapping and links every existing event to its
+genres. Crawls keep the links up to date afterwards.
+
+    python -m app.onetime.build_genres
+"""
+import asyncio
+
+from tortoise import Tortoise
+
+from app import init_tortoise
+from app.genres import DEFAULT_CATEGORY_GENRES, genre_key, link_genres, split_genres
+from app.models import CategoryGenres, Events
+
+BATCH_SIZE = 1000
+
+
+async def main():
+    await init_tortoise()
+
+    await CategoryGenres.bulk_create(
+        [CategoryGenres(category=category, genre_key=genre_key(name))
+         for category, names in DEFAULT_CATEGORY_GENRES.items() for name in names],
+        ignore_conflicts=True,
+    )
+
+    rows = await Events.all().order_by('id').values_list('id', 'genre')
+    for start in range(0, len(rows), BATCH_SIZE):
+        await link_genres({event_id: split_genres(genre) for event_id, genre in rows[start:start + BATCH_SIZE]})
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
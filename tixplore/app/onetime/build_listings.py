@@ -0,0 +1,29 @@
+"""
+Builds the event_listings rows of every event. Crawls keep them up to
+date afterwards.
+
+    python -m app.onetime.build_listings
+"""
+import asyncio
+
+from tortoise import Tortoise
+
+from app import init_tortoise
+from app.listings import refresh_listings
+from app.models import Events
+
+BATCH_SIZE = 1000
+
+
+async def main():
+    await init_tortoise()
+
+    event_ids = await Events.all().order_by('id').values_list('id', flat=True)
+    for start in range(0, len(event_ids), BATCH_SIZE):
+        await refresh_listings(event_ids[start:start + BATCH_SIZE])
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
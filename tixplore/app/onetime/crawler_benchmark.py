@@ -0,0 +1,73 @@
+"""
+Measures Bubilet crawl throughput against a local stub of its API.
+
+Every stub endpoint answers after a fixed delay, so the numbers show how much
+of the crawl is spent waiting on the network at each concurrency level. No
+database is involved.
+
+    python -m app.onetime.crawler_benchmark
+"""
+import asyncio
+import base64
+import json
+import time
+
+from aiohttp import web
+
+from app.crawlers.bubilet_crawler import Bubilet_Crawler
+from app.crawlers.http_client import HttpClient
+
+TICKETS = 200
+LATENCY = 0.02
+CONCURRENCY_LEVELS = [1, 4, 16, 32]
+
+
+def stub_app() -> web.Application:
+    tickets = [{'etkinlikId': i, 'slug': f'etkinlik-{i}', 'etkinlikAdi': f'Etkinlik {i}'} for i in range(TICKETS)]
+    prices = {
+        '_v': 0,
+        '_d': base64.b64encode(json.dumps({'data': [{'sessions': [{'tarih': '2025-01-01T20:00:00', 'indirimliFiyat': 100}]}]}).encode()).decode(),
+    }
+
+    def respond(payload):
+        async def handler(request):
+            await asyncio.sleep(LATENCY)
+            return web.json_response(payload)
+        return handler
+
+    stub = web.Application()
+    stub.router.add_get('/api/Anasayfa/6/Etkinlikler', respond(tickets))
+    stub.router.add_get('/api/Etkinlik/{id}/Mekanlar', respond([{'id': 1, 'baslik': 'Sahne', 'ilAdi': 'İstanbul', 'enlem': '41.0', 'boylam': '29.0'}]))
+    stub.router.add_get('/api/Etkinlik/Slug/{slug}', respond({'dosyalar': [], 'ozet': '', 'sure': ''}))
+    stub.router.add_get('/api/Etkinlik/{id}/sessions/all', respond(prices))
+    stub.router.add_get('/api/Etkinlik/{id}/Etiket', respond([{'adi': 'Tiyatro'}]))
+    return stub
+
+
+async def crawl(base_url: str, concurrency: int) -> float:
+    start = time.perf_counter()
+    async with HttpClient(concurrency=concurrency, rate_per_host=None) as client:
+        crawler = Bubilet_Crawler(client, base_url=base_url)
+        latest = await crawler.get_latest_tickets('34')
+        await asyncio.gather(*(crawler.enrich_ticket(ticket, '34') for ticket in latest))
+    return time.perf_counter() - start
+
+
+async def main():
+    runner = web.AppRunner(stub_app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f'http://127.0.0.1:{port}/api'
+
+    print(f'{"concurrency":<14}{"seconds":>10}{"tickets/s":>12}')
+    for concurrency in CONCURRENCY_LEVELS:
+        elapsed = await crawl(base_url, concurrency)
+        print(f'{concurrency:<14}{elapsed:>10.2f}{TICKETS / elapsed:>12.1f}')
+
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
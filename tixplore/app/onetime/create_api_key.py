@@ -0,0 +1,30 @@
+"""
+Creates an API key and prints it. Only its hash is stored, so the key cannot
+be shown again.
+
+    python -m app.onetime.create_api_key "partner name"
+"""
+import asyncio
+import secrets
+import sys
+
+from tortoise import Tortoise
+
+from app import app, init_tortoise
+from app.models import ApiKeys
+from app.security import hash_api_key
+
+
+async def main(name: str):
+    await init_tortoise()
+
+    api_key = secrets.token_urlsafe(32)
+    async with app.app_context():
+        await ApiKeys.create(name=name, key_hash=hash_api_key(api_key))
+    print(api_key)
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1]))
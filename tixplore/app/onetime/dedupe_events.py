@@ -0,0 +1,44 @@
+"""
+Fills the deduplication keys of existing events and links duplicates across
+sources. Crawls keep both up to date afterwards.
+
+Events are resolved in id order, a batch at a time; each batch is only
+compared with the events on the same dates, see app.dedup.
+
+    python -m app.onetime.dedupe_events
+"""
+import asyncio
+
+from tortoise import Tortoise
+
+from app import init_tortoise
+from app.dedup import event_date, name_key, resolve_duplicates
+from app.listings import refresh_listings
+from app.models import Events
+
+BATCH_SIZE = 1000
+
+
+async def main():
+    await init_tortoise()
+
+    rows = await Events.all().order_by('id').values_list('id', 'name', 'time')
+    for start in range(0, len(rows), BATCH_SIZE):
+        await Events.bulk_update(
+            [Events(id=event_id, name_key=name_key(name), event_date=event_date(time))
+             for event_id, name, time in rows[start:start + BATCH_SIZE]],
+            fields=['name_key', 'event_date'],
+        )
+
+    active_ids = await Events.filter(is_active=True).order_by('id').values_list('id', flat=True)
+    refresh_ids = set()
+    for start in range(0, len(active_ids), BATCH_SIZE):
+        refresh_ids |= await resolve_duplicates(active_ids[start:start + BATCH_SIZE])
+    await refresh_listings(refresh_ids)
+    print(f'{len(active_ids)} events resolved, {len(refresh_ids)} listing rows rebuilt')
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+"""
+Removes duplicate ticket sites left behind by earlier Bubilet crawls, which
+inserted a new row on every run. The newest row per (event, name) is kept.
+Run it before applying the unique (event_id, name) constraint.
+
+    python -m app.onetime.dedupe_ticket_sites
+"""
+import asyncio
+
+from tortoise import Tortoise, connections
+
+from app import init_tortoise
+
+STATEMENT = """
+    DELETE FROM ticket_sites a
+    USING ticket_sites b
+    WHERE a.event_id = b.event_id AND a.name = b.name AND a.id < b.id
+"""
+
+
+async def main():
+    await init_tortoise()
+    await connections.get('default').execute_script(STATEMENT)
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Converts events.time from text to timestamptz and adds the end_time column.
+
+Values without an offset are read as local Turkish time. Rows whose time is
+not an ISO date cannot be placed on the calendar; they are deactivated and
+set to the epoch so the conversion can go through. The partial index serves
+the default /get-events query, which only lists active, upcoming events.
+Postgres does not allow now() in an index predicate, so the index covers
+active events and the date bound is a range condition on it.
+
+    python -m app.onetime.event_time
+"""
+import asyncio
+
+from tortoise import Tortoise, connections
+
+from app import init_tortoise
+from app.dates import EVENT_TIMEZONE_NAME
+
+STATEMENTS = [
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS end_time timestamptz",
+    f"""
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'events' AND column_name = 'time') <> 'timestamp with time zone' THEN
+            UPDATE events SET is_active = false, "time" = '1970-01-01'
+            WHERE "time" !~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}';
+            ALTER TABLE events ALTER COLUMN "time" TYPE timestamptz USING (
+                CASE WHEN "time" ~ 'T.*(Z|[+-]\\d{{2}}(:?\\d{{2}})?)$' THEN "time"::timestamptz
+                     ELSE "time"::timestamp AT TIME ZONE '{EVENT_TIMEZONE_NAME}'
+                END
+            );
+        END IF;
+    END
+    $$
+    """,
+    'CREATE INDEX IF NOT EXISTS events_active_time_id_idx ON events ("time", id) WHERE is_active',
+    "CREATE INDEX IF NOT EXISTS events_active_end_time_idx ON events (end_time) WHERE is_active AND end_time IS NOT NULL",
+]
+
+
+async def main():
+    await init_tortoise()
+    connection = connections.get('default')
+
+    for statement in STATEMENTS:
+        await connection.execute_script(statement)
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
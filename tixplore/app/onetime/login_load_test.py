@@ -0,0 +1,52 @@
+"""
+Fires concurrent /login requests at a running server and reports throughput
+and latency percentiles. Register the account first.
+
+    python -m app.onetime.login_load_test http://127.0.0.1:5000 user@example.com password
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import aiohttp
+
+REQUESTS = 400
+CONCURRENCY = [1, 8, 32]
+
+
+async def run(base_url: str, email: str, password: str, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def login(session):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.get(f'{base_url}/login', params={'email': email, 'password': password}) as response:
+                await response.read()
+                if response.status != 200:
+                    failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(login(session) for _ in range(REQUESTS)))
+        elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f'{concurrency:<14}{REQUESTS / elapsed:>10.1f}{quantiles[49] * 1000:>10.1f}'
+          f'{quantiles[98] * 1000:>10.1f}{failures:>10}')
+
+
+async def main(base_url: str, email: str, password: str):
+    # Rate limiting answers 429 once the limit is hit; start the server with e.g.
+    # RATE_LIMIT_AUTH=100000 for this test
+    print(f'{"concurrency":<14}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"failed":>10}')
+    for concurrency in CONCURRENCY:
+        await run(base_url, email, password, concurrency)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*sys.argv[1:4]))
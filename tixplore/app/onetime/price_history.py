@@ -0,0 +1,23 @@
+"""
+Creates the partitioned price_observations table and its first partitions.
+Crawls create the partitions of upcoming months as they go.
+
+    python -m app.onetime.price_history
+"""
+import asyncio
+
+from tortoise import Tortoise, connections
+
+from app import init_tortoise
+from app.prices import CREATE_TABLE_SQL, ensure_partitions
+
+
+async def main():
+    await init_tortoise()
+    await connections.get('default').execute_script(CREATE_TABLE_SQL)
+    await ensure_partitions(months_ahead=2)
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Retires the events stored before crawls were keyed on (source, external_id).
+
+Those rows have no source or external id, so the first crawl after the
+upgrade inserted a fresh row next to each of them, and finish() never
+deactivates them because they belong to no source. Run this once after
+every crawler has completed a crawl with the new code:
+
+- favorites of a legacy event move to the crawled event with a matching
+  name and venue on the same day, see app.dedup.best_match
+- legacy events are deactivated, not deleted, so their price history stays
+- duplicate groups a legacy event was canonical for get a new canonical event
+
+    python -m app.onetime.retire_legacy_events
+"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from app import init_tortoise
+from app.cache import notify_events_changed
+from app.dedup import best_match, event_date, name_key, promote_canonicals
+from app.listings import refresh_listings
+from app.models import Events, UserFavorites
+
+MOVE_FAVORITES_SQL = """
+    INSERT INTO user_favorites (user_id, event_id, created_at)
+    SELECT f.user_id, m.new_id, f.created_at
+    FROM user_favorites f
+    JOIN unnest($1::int[], $2::int[]) AS m(old_id, new_id) ON m.old_id = f.event_id
+    ON CONFLICT (user_id, event_id) DO NOTHING
+"""
+
+
+def _match_fields(event: Dict) -> Dict:
+    return {
+        'id': event['id'], 'source': event['source'], 'name_key': name_key(event['name']),
+        'location': event['location'], 'event_date': event_date(event['time']),
+        'canonical_id': event['canonical_id'],
+    }
+
+
+async def retire_legacy_events() -> Tuple[int, int]:
+    """Deactivate the legacy events and return how many there were and how many had a crawled match"""
+    fields = ('id', 'source', 'name', 'location', 'time', 'canonical_id')
+    legacy = [_match_fields(event) for event in await Events.filter(source__isnull=True, is_active=True).values(*fields)]
+    if not legacy:
+        return 0, 0
+
+    dates = list({event['event_date'] for event in legacy})
+    candidates = defaultdict(list)
+    for event in await Events.filter(source__not_isnull=True, is_active=True, event_date__in=dates).values(*fields):
+        candidate = _match_fields(event)
+        candidates[candidate['event_date']].append(candidate)
+
+    replacements = {}
+    for event in legacy:
+        match = best_match(event, candidates[event['event_date']])
+        if match is not None:
+            replacements[event['id']] = match['id']
+
+    legacy_ids = [event['id'] for event in legacy]
+    async with in_transaction() as connection:
+        if replacements:
+            await connection.execute_query(MOVE_FAVORITES_SQL, [list(replacements), list(replacements.values())])
+            await UserFavorites.filter(event_id__in=list(replacements)).using_db(connection).delete()
+        await Events.filter(id__in=legacy_ids).using_db(connection).update(is_active=False)
+
+    await refresh_listings(await promote_canonicals(legacy_ids))
+    await notify_events_changed()
+    return len(legacy_ids), len(replacements)
+
+
+async def main():
+    await init_tortoise()
+
+    if not await Events.filter(source__not_isnull=True, is_active=True).exists():
+        print('No crawled events yet, run the crawlers first')
+    else:
+        retired, matched = await retire_legacy_events()
+        print(f'{retired} legacy events deactivated, favorites of {matched} moved to crawled events')
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+"""
+Revokes the API keys created with a name. Workers that validated a key
+recently keep accepting it for up to API_KEY_CACHE_TTL seconds.
+
+    python -m app.onetime.revoke_api_key "partner name"
+"""
+import asyncio
+import sys
+
+from tortoise import Tortoise, timezone
+
+from app import init_tortoise
+from app.models import ApiKeys
+
+
+async def revoke_api_keys(name: str) -> int:
+    """Deactivate the active keys named name and return how many there were"""
+    return await ApiKeys.filter(name=name, is_active=True).update(is_active=False, revoked_at=timezone.now())
+
+
+async def main(name: str):
+    await init_tortoise()
+
+    revoked = await revoke_api_keys(name)
+    print(f'{revoked} API keys revoked')
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1]))
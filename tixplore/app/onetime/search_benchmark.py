@@ -0,0 +1,77 @@
+"""
+Compares the old ILIKE search with the full-text search on synthetic events.
+
+Run it against a scratch database, it inserts the synthetic rows itself:
+
+    BENCHMARK_DATABASE_URI=postgres://postgres@localhost:5432/tixplore_bench \\
+        python -m app.onetime.search_benchmark 100000
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from tortoise import Tortoise, connections
+from tortoise.expressions import Q
+
+from app.api.search import search_events
+from app.models import Events
+from app.onetime.search_index import STATEMENTS
+
+WORDS = [
+    'konser', 'tiyatro', 'stand', 'up', 'caz', 'rock', 'opera', 'bale', 'çocuk', 'müzikal',
+    'kadıköy', 'beşiktaş', 'şişli', 'istanbul', 'ankara', 'İzmir', 'gece', 'akustik', 'festival', 'komedi',
+]
+GENRES = ['Tiyatro', 'Stand Up', 'macera', 'romantik', 'Konser', 'Çocuk']
+QUERIES = ['kadikoy', 'stand up', 'müz', 'istanbul konser', 'bale']
+REPEAT = 20
+
+
+def synthetic_event(index: int) -> Events:
+    return Events(
+        name=' '.join(random.choices(WORDS, k=3)) + f' {index}',
+        type=random.choice(GENRES),
+        genre=','.join(random.sample(GENRES, 2)),
+        location=random.choice(WORDS),
+        time=datetime(2025, random.randint(1, 12), random.randint(1, 28), tzinfo=timezone.utc),
+        image_url=None,
+        description=' '.join(random.choices(WORDS, k=60)),
+        director='',
+        cast=[],
+        duration='',
+        rating=0,
+    )
+
+
+async def timed(query) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        await query.limit(50)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+async def main(count: int):
+    await Tortoise.init(db_url=os.environ['BENCHMARK_DATABASE_URI'], modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas(safe=True)
+    connection = connections.get('default')
+    for statement in STATEMENTS:
+        await connection.execute_script(statement)
+
+    missing = count - await Events.all().count()
+    if missing > 0:
+        await Events.bulk_create([synthetic_event(i) for i in range(missing)], batch_size=5000)
+    await connection.execute_script('ANALYZE events')
+
+    print(f'{"query":<20}{"ilike ms":>12}{"fulltext ms":>14}')
+    for search_text in QUERIES:
+        ilike = Events.filter(Q(name__icontains=search_text) | Q(description__icontains=search_text))
+        fulltext = search_events(Events.all(), search_text).order_by('-search_rank', 'id')
+        print(f'{search_text:<20}{await timed(ilike):>12.2f}{await timed(fulltext):>14.2f}')
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
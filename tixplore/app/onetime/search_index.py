@@ -0,0 +1,53 @@
+"""
+Adds the full-text search column used by /get-events.
+
+The text search configuration folds Turkish characters with unaccent before
+stemming, so 'kadikoy' matches 'Kadıköy'. The vector is a generated column,
+which keeps it in sync with crawler writes without any application code.
+
+    python -m app.onetime.search_index
+"""
+import asyncio
+
+from tortoise import Tortoise, connections
+
+from app import init_tortoise
+from app.api.search import SEARCH_CONFIG
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = turkish);
+            ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, turkish_stem;
+        END IF;
+    END
+    $$
+    """,
+    f"""
+    ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', replace(coalesce(genre, ''), ',', ' ')), 'B') ||
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')
+        ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS events_search_vector_idx ON events USING GIN (search_vector)",
+]
+
+
+async def main():
+    await init_tortoise()
+    connection = connections.get('default')
+
+    for statement in STATEMENTS:
+        await connection.execute_script(statement)
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Compares encode time and response size of a 1k-event listing payload for
+the stdlib json module and orjson, uncompressed and compressed.
+
+    python -m app.onetime.serialization_benchmark
+"""
+import gzip
+import json
+import timeit
+
+import orjson
+
+from app.api.responses import brotli
+
+EVENTS = 1000
+REPEAT = 50
+
+
+def synthetic_payload():
+    return {
+        "is_success": True,
+        "next_cursor": None,
+        "data": [
+            {
+                "id": str(i),
+                "name": f"Etkinlik {i}",
+                "type": "Tiyatro",
+                "genre": ["Tiyatro", "Dram"],
+                "location": "Kadıköy Sahne",
+                "time": "2025-01-01",
+                "imageUrl": "/api/placeholder/800/400",
+                "description": "Oyun iki perdeden oluşuyor. " * 20,
+                "director": "",
+                "cast": [],
+                "duration": "120",
+                "rating": 0.0,
+                "ticket_sites": [{"name": "bubilet.com", "price": 250.0, "url": f"https://www.bubilet.com.tr/istanbul/etkinlik/{i}"}],
+                "isFavorite": False,
+            }
+            for i in range(EVENTS)
+        ],
+    }
+
+
+def report(name, func):
+    seconds = timeit.timeit(func, number=REPEAT) / REPEAT
+    print(f'{name:<24}{seconds * 1000:>10.2f}ms{len(func()):>12} bytes')
+
+
+def main():
+    payload = synthetic_payload()
+    json_body = json.dumps(payload).encode('utf-8')
+    orjson_body = orjson.dumps(payload)
+
+    report('json.dumps', lambda: json.dumps(payload).encode('utf-8'))
+    report('orjson.dumps', lambda: orjson.dumps(payload))
+    report('gzip (level 5)', lambda: gzip.compress(orjson_body, compresslevel=5))
+    if brotli is not None:
+        report('brotli (quality 4)', lambda: brotli.compress(orjson_body, quality=4))
+    print(f'json.dumps escapes non-ASCII, so its body is {len(json_body) - len(orjson_body)} bytes larger')
+
+
+if __name__ == '__main__':
+    main()
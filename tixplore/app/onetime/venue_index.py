@@ -0,0 +1,32 @@
+"""
+Adds the spatial index used by /events/nearby.
+
+A GiST index on point(longitude, latitude) answers the bounding box test of
+app.venues.NEARBY_SQL with core Postgres; PostGIS is not needed at this
+data size.
+
+    python -m app.onetime.venue_index
+"""
+import asyncio
+
+from tortoise import Tortoise, connections
+
+from app import init_tortoise
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS venues_location_idx ON venues USING GIST (point(longitude, latitude))",
+]
+
+
+async def main():
+    await init_tortoise()
+    connection = connections.get('default')
+
+    for statement in STATEMENTS:
+        await connection.execute_script(statement)
+
+    await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
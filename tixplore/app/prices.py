@@ -0,0 +1,126 @@
+""" Append-only price history of ticket sites, partitioned by month """
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tortoise import connections
+
+HISTORY_BUCKETS = ('hour', 'day', 'week', 'month')
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS price_observations (
+        event_id integer NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+        site varchar(100) NOT NULL,
+        price double precision NOT NULL,
+        observed_at timestamptz NOT NULL DEFAULT now()
+    ) PARTITION BY RANGE (observed_at);
+
+    -- Serves both latest-price-per-site lookups and per-site history scans
+    CREATE INDEX IF NOT EXISTS price_observations_event_site_time_idx
+        ON price_observations (event_id, site, observed_at DESC);
+
+    CREATE TABLE IF NOT EXISTS price_observations_default PARTITION OF price_observations DEFAULT;
+"""
+
+RECORD_SQL = """
+    INSERT INTO price_observations (event_id, site, price)
+    SELECT * FROM unnest($1::int[], $2::varchar[], $3::double precision[])
+"""
+
+CHEAPEST_SQL = """
+    SELECT t.name, t.price, t.url, latest.observed_at
+    FROM ticket_sites t
+    LEFT JOIN LATERAL (
+        SELECT p.observed_at
+        FROM price_observations p
+        WHERE p.event_id = t.event_id AND p.site = t.name
+        ORDER BY p.observed_at DESC
+        LIMIT 1
+    ) latest ON true
+    -- Offers of every source listing the event, see app.dedup
+    WHERE t.event_id IN (
+        SELECT m.id
+        FROM events m, (SELECT coalesce(canonical_id, id) AS id FROM events WHERE id = $1) root
+        WHERE (m.id = root.id OR m.canonical_id = root.id) AND m.is_active
+    )
+    ORDER BY t.price, t.id
+    LIMIT 1
+"""
+
+# The bucket is one of HISTORY_BUCKETS and is validated before it is inlined
+HISTORY_SQL = """
+    SELECT site, date_trunc('{bucket}', observed_at) AS bucket,
+           min(price) AS min_price, max(price) AS max_price, avg(price) AS avg_price,
+           count(*) AS observations
+    FROM price_observations
+    WHERE event_id = $1 AND observed_at >= $2 AND observed_at < $3
+    GROUP BY site, bucket
+    ORDER BY site, bucket
+"""
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _partition_sql(month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS price_observations_{month:%Y_%m} PARTITION OF price_observations "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+    )
+
+
+async def ensure_partitions(months_ahead: int = 1):
+    """Create the partitions of this month and the next months_ahead months"""
+    month = _month_start(date.today())
+    statements = []
+    for _ in range(months_ahead + 1):
+        statements.append(_partition_sql(month))
+        month = _next_month(month)
+    await connections.get('default').execute_script(';\n'.join(statements))
+
+
+async def record_prices(observations: Iterable[Tuple[int, str, float]], using_db=None):
+    """Append (event_id, site, price) observations stamped with the current time"""
+    observations = list(observations)
+    if not observations:
+        return
+    event_ids, sites, prices = zip(*observations)
+    connection = using_db or connections.get('default')
+    await connection.execute_query(RECORD_SQL, [list(event_ids), list(sites), list(prices)])
+
+
+async def cheapest_offer(event_id: int) -> Optional[Dict]:
+    _, rows = await connections.get('default').execute_query(CHEAPEST_SQL, [event_id])
+    if not rows:
+        return None
+    row = rows[0]
+    return {
+        "name": row['name'],
+        "price": row['price'],
+        "url": row['url'],
+        "observed_at": row['observed_at'].isoformat() if row['observed_at'] else None,
+    }
+
+
+async def price_history(event_id: int, start: datetime, end: datetime, bucket: str) -> List[Dict]:
+    """Observations of an event between start and end, downsampled to one row per site and bucket"""
+    if bucket not in HISTORY_BUCKETS:
+        raise ValueError(f'Unknown bucket {bucket}')
+    _, rows = await connections.get('default').execute_query(
+        HISTORY_SQL.format(bucket=bucket), [event_id, start, end]
+    )
+    return [
+        {
+            "site": row['site'],
+            "time": row['bucket'].isoformat(),
+            "min_price": row['min_price'],
+            "max_price": row['max_price'],
+            "avg_price": row['avg_price'],
+            "observations": row['observations'],
+        }
+        for row in rows
+    ]
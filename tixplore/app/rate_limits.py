@@ -0,0 +1,104 @@
+""" Rate limit tiers, cost weighting and the shared limiter store """
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from quart import g, request
+from quart_rate_limiter import RateLimit
+from quart_rate_limiter.store import MemoryStore, RateLimiterStoreABC
+
+from .config import Config
+from .security import hash_api_key, is_valid_api_key
+
+# Relative cost of a request against its route's budget
+SEARCH_COST = 3
+EXPORT_COST = 10
+
+
+async def _valid_api_key() -> Optional[str]:
+    api_key = request.headers.get('X-API-Key')
+    if api_key and await is_valid_api_key(api_key):
+        return api_key
+    return None
+
+
+async def client_key() -> str:
+    """API clients are limited per key, everyone else per address"""
+    api_key = await _valid_api_key()
+    if api_key is not None:
+        return f'key:{hash_api_key(api_key)}'
+    return f'addr:{request.access_route[0] if request.access_route else request.remote_addr}'
+
+
+async def _has_api_key() -> bool:
+    return await _valid_api_key() is not None
+
+
+async def _lacks_api_key() -> bool:
+    return await _valid_api_key() is None
+
+
+def tiered_limits(anonymous: int, period: timedelta, keyed: Optional[int] = None) -> List[RateLimit]:
+    """One budget for anonymous clients and a larger one for API key holders"""
+    if keyed is None:
+        keyed = anonymous * Config.RATE_LIMIT_API_KEY_FACTOR
+    return [
+        RateLimit(anonymous, period, key_function=client_key, skip_function=_has_api_key),
+        RateLimit(keyed, period, key_function=client_key, skip_function=_lacks_api_key),
+    ]
+
+
+DEFAULT_LIMITS = tiered_limits(Config.RATE_LIMIT_DEFAULT, timedelta(seconds=5))
+EVENTS_LIMITS = tiered_limits(Config.RATE_LIMIT_EVENTS, timedelta(seconds=10))
+AUTH_LIMITS = tiered_limits(Config.RATE_LIMIT_AUTH, timedelta(minutes=1), keyed=Config.RATE_LIMIT_AUTH)
+
+
+def request_cost() -> int:
+    if request.args.get('format') == 'ndjson':
+        return EXPORT_COST
+    if request.args.get('search_text'):
+        return SEARCH_COST
+    return 1
+
+
+class WeightedStore(RateLimiterStoreABC):
+    """Wraps a store so a request uses request_cost() units of its budget instead of one.
+
+    The limiter reads the theoretical arrival time (TAT) of a key, then
+    writes it back advanced by one emission interval. The wrapper
+    remembers the TAT it read during the request and stretches that
+    advance by the request cost.
+    """
+
+    def __init__(self, store: RateLimiterStoreABC):
+        self.store = store
+
+    async def get(self, key: str, default: datetime) -> datetime:
+        value = await self.store.get(key, default)
+        reads = g.setdefault('rate_limit_reads', {})
+        # The limiter passes its current time as the default
+        reads[key] = max(value, default)
+        return value
+
+    async def set(self, key: str, tat: datetime) -> None:
+        previous = g.get('rate_limit_reads', {}).pop(key, None)
+        cost = request_cost()
+        if previous is not None and cost > 1:
+            tat = previous + (tat - previous) * cost
+        await self.store.set(key, tat)
+
+    async def before_serving(self) -> None:
+        await self.store.before_serving()
+
+    async def after_serving(self) -> None:
+        await self.store.after_serving()
+
+
+def create_store(config) -> RateLimiterStoreABC:
+    """Redis-backed when RATE_LIMIT_STORE_URI is set so all workers share limits, in-memory otherwise"""
+    uri = config['RATE_LIMIT_STORE_URI']
+    if uri:
+        from quart_rate_limiter.redis_store import RedisStore
+        store = RedisStore(uri)
+    else:
+        store = MemoryStore()
+    return WeightedStore(store)
@@ -1,9 +1,97 @@
 """ Security Related things """
+import asyncio
+import hashlib
+import hmac
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from quart import request, abort
+from typing import Optional
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
+from quart import current_app, request, abort
 from quart_auth import current_user, login_required
 
-from app.models import ApiKeys
+from app.cache import TTLCache
+from app.models import ApiKeys, Users
+
+# Hashes of valid keys. Revoking a key takes effect once its entry expires,
+# so API_KEY_CACHE_TTL bounds the revocation delay.
+api_key_cache = TTLCache(max_entries=4096)
+# Hashes of rejected keys, kept apart so a client guessing keys cannot evict
+# valid ones. Each new guess still costs one query.
+api_key_negative_cache = TTLCache(max_entries=512)
+
+password_hasher = PasswordHasher()
+# Hashing is CPU-bound and argon2 releases the GIL, so it runs on a small
+# dedicated pool instead of stalling the event loop
+password_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='password')
+# Verified against when the email is unknown, so both paths cost the same
+_DUMMY_HASH = password_hasher.hash('dummy-password')
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, password_hasher.hash, password)
+
+
+def _verify(password_hash: str, password: str) -> bool:
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerifyMismatchError, InvalidHashError):
+        return False
+
+
+async def authenticate(email: str, password: str) -> Optional[Users]:
+    """Return the user if the password matches, upgrading legacy plaintext passwords to argon2"""
+    user = await Users.get_or_none(email=email)
+    loop = asyncio.get_running_loop()
+
+    if user is None:
+        await loop.run_in_executor(password_executor, _verify, _DUMMY_HASH, password)
+        return None
+
+    if not user.password.startswith('$argon2'):
+        # Accounts created before hashing store the password as is
+        if not hmac.compare_digest(user.password.encode('utf-8'), password.encode('utf-8')):
+            return None
+        user.password = await hash_password(password)
+        await user.save(update_fields=['password'])
+        return user
+
+    if not await loop.run_in_executor(password_executor, _verify, user.password, password):
+        return None
+
+    if password_hasher.check_needs_rehash(user.password):
+        user.password = await hash_password(password)
+        await user.save(update_fields=['password'])
+    return user
+
+
+def issue_token(user: Users) -> str:
+    """Signed bearer token of a logged in user, valid for QUART_AUTH_DURATION"""
+    extension = current_app.extensions['QUART_AUTH'][0]
+    return extension.dump_token(str(user.id))
+
+
+def hash_api_key(api_key: str) -> str:
+    """Keyed hash of an API key, only this is stored in the database"""
+    return hmac.new(current_app.config['SALT'].encode('utf-8'), api_key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+async def is_valid_api_key(api_key: str) -> bool:
+    key_hash = hash_api_key(api_key)
+    if api_key_cache.get(key_hash):
+        return True
+    if api_key_negative_cache.get(key_hash):
+        return False
+
+    valid = await ApiKeys.filter(key_hash=key_hash, is_active=True).exists()
+    if valid:
+        api_key_cache.set(key_hash, True, current_app.config['API_KEY_CACHE_TTL'])
+    else:
+        # A client retrying with the same bad key is answered from memory
+        api_key_negative_cache.set(key_hash, True, current_app.config['API_KEY_NEGATIVE_CACHE_TTL'])
+    return valid
 
 
 def api_key_required(f):
@@ -14,10 +102,7 @@ def api_key_required(f):
         if not api_key:
             abort(401, description="API key is missing")
 
-        # Retrieve the first API key from the database
-        key = await ApiKeys.filter(key=api_key).first()
-
-        if not key:
+        if not await is_valid_api_key(api_key):
             abort(403, description="Invalid API key")
 
         return await f(*args, **kwargs)
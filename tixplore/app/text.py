@@ -0,0 +1,23 @@
+""" Text normalization shared by search, genres, venues and deduplication """
+import re
+import unicodedata
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize_search_text(search_text: str) -> str:
+    """Lowercase with Turkish casing rules (I -> ı, İ -> i)"""
+    return search_text.replace('İ', 'i').replace('I', 'ı').lower()
+
+
+def text_key(value: str, fold_accents: bool = False) -> str:
+    """Lowercase words of value joined by single spaces.
+
+    With fold_accents the key is also ASCII-only and punctuation-free, so
+    Kadıköy and KADIKOY compare equal.
+    """
+    value = normalize_search_text(value)
+    if fold_accents:
+        value = unicodedata.normalize('NFKD', value.replace('ı', 'i')).encode('ascii', 'ignore').decode('ascii')
+        value = _NON_WORD_RE.sub(' ', value)
+    return ' '.join(value.split())
@@ -0,0 +1,103 @@
+""" Venues with coordinates and the distance-sorted nearby events query """
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from .databases import read_connection
+from .models import Venues
+from .text import text_key
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE_LATITUDE = 111320
+
+# The bounding box test uses the GiST index on point(longitude, latitude)
+# created by app.onetime.venue_index; the haversine distance then drops the
+# box corners and sorts the remaining events.
+NEARBY_SQL = f"""
+    WITH nearby AS (
+        SELECT
+            v.id,
+            2 * {EARTH_RADIUS_METERS} * asin(sqrt(
+                power(sin(radians(v.latitude - $1) / 2), 2) +
+                cos(radians($1)) * cos(radians(v.latitude)) * power(sin(radians(v.longitude - $2) / 2), 2)
+            )) AS distance
+        FROM venues v
+        WHERE point(v.longitude, v.latitude) <@ box(point($3, $4), point($5, $6))
+    )
+    SELECT e.id, n.distance
+    FROM events e
+    JOIN nearby n ON n.id = e.venue_id
+    WHERE n.distance <= $7 AND e.is_active AND e.canonical_id IS NULL AND (e."time" >= $8 OR e.end_time >= $8)
+    ORDER BY n.distance, e."time", e.id
+    LIMIT $9
+"""
+
+
+def coordinate(data: Dict, *keys: str) -> Optional[float]:
+    """First of keys that holds a number, as a float"""
+    for key in keys:
+        try:
+            return float(data[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def venue_data(external_id, name: str, city: Optional[str], latitude: Optional[float],
+               longitude: Optional[float]) -> Optional[Dict]:
+    """The venue_data entry of parsed event data, or None when the venue has no name"""
+    if not name:
+        return None
+    if latitude is not None and longitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        latitude = longitude = None
+    # Sources that do not give venues an id are keyed on the normalized name
+    return {
+        'external_id': str(external_id) if external_id else text_key(name),
+        'name': name,
+        'city': city or None,
+        'latitude': latitude,
+        'longitude': longitude,
+    }
+
+
+async def upsert_venues(source: str, venues: Iterable[Dict], using_db: BaseDBAsyncClient) -> Dict[str, int]:
+    """Insert or update venues of a source and return their ids by external id"""
+    venues = {venue['external_id']: venue for venue in venues}
+    if not venues:
+        return {}
+    await Venues.bulk_create(
+        [Venues(source=source, **venue) for venue in venues.values()],
+        on_conflict=['source', 'external_id'],
+        update_fields=['name', 'city', 'latitude', 'longitude'],
+        using_db=using_db,
+    )
+    rows = await Venues.filter(source=source, external_id__in=list(venues)).using_db(using_db).values_list('external_id', 'id')
+    return dict(rows)
+
+
+def bounding_box(latitude: float, longitude: float, radius: float) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a box holding the circle of radius meters"""
+    delta_latitude = radius / METERS_PER_DEGREE_LATITUDE
+    # Longitude degrees shrink towards the poles; near them the box spans every longitude
+    cos_latitude = math.cos(math.radians(latitude))
+    if cos_latitude < 1e-6 or abs(latitude) + delta_latitude >= 90:
+        delta_longitude = 180
+    else:
+        delta_longitude = min(radius / (METERS_PER_DEGREE_LATITUDE * cos_latitude), 180)
+    return (longitude - delta_longitude, max(latitude - delta_latitude, -90),
+            longitude + delta_longitude, min(latitude + delta_latitude, 90))
+
+
+async def nearby_events(latitude: float, longitude: float, radius: float, start: datetime,
+                        limit: int) -> List[Tuple[int, float]]:
+    """(event id, distance in meters) of active events within radius meters, nearest first.
+
+    Events that ended before start are left out.
+    """
+    min_lon, min_lat, max_lon, max_lat = bounding_box(latitude, longitude, radius)
+    _, rows = await read_connection().execute_query(
+        NEARBY_SQL, [latitude, longitude, min_lon, min_lat, max_lon, max_lat, radius, start, limit]
+    )
+    return [(row['id'], row['distance']) for row in rows]
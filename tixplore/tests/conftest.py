@@ -0,0 +1,101 @@
+""" Shared fixtures. Database tests run against TEST_DATABASE_URI and are skipped without it.
+
+The database is wiped before every test, so never point TEST_DATABASE_URI
+at a database whose data you want to keep.
+"""
+import json
+import logging
+import os
+from datetime import timedelta
+
+import pytest
+from asyncpg.exceptions import FeatureNotSupportedError
+
+TEST_DATABASE_URI = os.getenv('TEST_DATABASE_URI')
+if TEST_DATABASE_URI:
+    # Read by app.config on import
+    os.environ['DATABASE_URI'] = TEST_DATABASE_URI
+
+from tortoise import Tortoise, connections  # noqa: E402
+
+from app import app as quart_app, rate_limiter  # noqa: E402
+from app.cache import response_cache  # noqa: E402
+from app.dates import start_of_today  # noqa: E402
+from app.metrics import logger  # noqa: E402
+from app.models import Events  # noqa: E402
+from app.onetime.search_index import STATEMENTS as SEARCH_INDEX_STATEMENTS  # noqa: E402
+from app.prices import CREATE_TABLE_SQL  # noqa: E402
+from app.rate_limits import create_store  # noqa: E402
+from app.security import api_key_cache, api_key_negative_cache  # noqa: E402
+
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URI, reason='TEST_DATABASE_URI is not set')
+
+
+async def reset_database():
+    connection = connections.get('default')
+    await connection.execute_script('DROP SCHEMA public CASCADE; CREATE SCHEMA public;')
+    await Tortoise.generate_schemas()
+    await connection.execute_script(CREATE_TABLE_SQL)
+
+
+@pytest.fixture
+async def test_app():
+    rate_limiter.store = create_store(quart_app.config)
+    response_cache.invalidate()
+    api_key_cache.clear()
+    api_key_negative_cache.clear()
+    async with quart_app.test_app() as test_app:
+        await reset_database()
+        yield test_app
+
+
+@pytest.fixture
+async def search_index(test_app):
+    """Adds events.search_vector, skipping the test when the server lacks the unaccent extension"""
+    connection = connections.get('default')
+    try:
+        await connection.execute_script(SEARCH_INDEX_STATEMENTS[0])
+    except FeatureNotSupportedError as e:
+        pytest.skip(str(e))
+    for statement in SEARCH_INDEX_STATEMENTS[1:]:
+        await connection.execute_script(statement)
+
+
+@pytest.fixture
+def client(test_app):
+    return test_app.test_client()
+
+
+@pytest.fixture
+def create_event():
+    counter = 0
+
+    async def create(**fields) -> Events:
+        nonlocal counter
+        counter += 1
+        defaults = {
+            'name': f'Event {counter}', 'type': 'Tiyatro', 'genre': 'Tiyatro', 'location': 'Sahne',
+            'time': start_of_today() + timedelta(days=1, minutes=counter), 'description': '', 'director': '',
+            'cast': [], 'duration': '', 'rating': 0,
+        }
+        return await Events.create(**{**defaults, **fields})
+
+    return create
+
+
+class _Collector(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.events = []
+
+    def emit(self, record):
+        self.events.append(json.loads(record.getMessage()))
+
+
+@pytest.fixture
+def structured_logs():
+    """Events logged through app.metrics.log during the test"""
+    collector = _Collector()
+    logger.addHandler(collector)
+    yield collector.events
+    logger.removeHandler(collector)
@@ -0,0 +1,79 @@
+import time
+
+from app import app
+from app.cache import TTLCache
+from app.models import ApiKeys
+from app.onetime.revoke_api_key import revoke_api_keys
+from app.security import api_key_cache, api_key_negative_cache, hash_api_key, is_valid_api_key
+
+from conftest import requires_db
+
+API_KEY = 'test-api-key'
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.monotonic()
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_entries_and_evicts_the_least_recently_used(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('app.cache.time.monotonic', clock)
+    cache = TTLCache(max_entries=2)
+
+    cache.set('short', 1, ttl=5)
+    cache.set('long', 2, ttl=60)
+    clock.now += 10
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+
+    cache.set('a', 3, ttl=60)
+    cache.set('b', 4, ttl=60)
+    assert cache.get('long') is None
+    assert (cache.get('a'), cache.get('b')) == (3, 4)
+
+
+@requires_db
+async def test_rejected_keys_do_not_evict_valid_ones(test_app, monkeypatch):
+    monkeypatch.setattr(api_key_negative_cache, 'max_entries', 2)
+    async with app.app_context():
+        await ApiKeys.create(name='test', key_hash=hash_api_key(API_KEY))
+        assert await is_valid_api_key(API_KEY)
+
+        for guess in range(5):
+            assert not await is_valid_api_key(f'guess-{guess}')
+
+        assert api_key_cache.get(hash_api_key(API_KEY)) is True
+        assert api_key_negative_cache.get(hash_api_key('guess-0')) is None
+        assert api_key_negative_cache.get(hash_api_key('guess-4')) is True
+
+
+@requires_db
+async def test_a_rejected_key_is_answered_from_the_negative_cache(test_app):
+    async with app.app_context():
+        assert not await is_valid_api_key(API_KEY)
+        # Created within API_KEY_NEGATIVE_CACHE_TTL of the rejection
+        await ApiKeys.create(name='test', key_hash=hash_api_key(API_KEY))
+        assert not await is_valid_api_key(API_KEY)
+
+        api_key_negative_cache.clear()
+        assert await is_valid_api_key(API_KEY)
+
+
+@requires_db
+async def test_a_revoked_key_is_rejected_once_its_entry_expires(test_app, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('app.cache.time.monotonic', clock)
+    async with app.app_context():
+        await ApiKeys.create(name='test', key_hash=hash_api_key(API_KEY))
+        assert await is_valid_api_key(API_KEY)
+
+        assert await revoke_api_keys('test') == 1
+        assert (await ApiKeys.get(name='test')).revoked_at is not None
+        assert await is_valid_api_key(API_KEY)
+
+        clock.now += app.config['API_KEY_CACHE_TTL'] + 1
+        assert not await is_valid_api_key(API_KEY)
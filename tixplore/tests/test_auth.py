@@ -0,0 +1,77 @@
+import json
+
+from app.models import Users
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+USER = {'email': 'ada@example.com', 'password': 'correct horse', 'name': 'Ada'}
+
+
+async def test_register_rejects_missing_name_without_creating_a_user(client):
+    response = await client.get('/register', query_string={'email': USER['email'], 'password': USER['password']})
+
+    assert response.status_code == 400
+    assert (await response.get_json())['message'] == 'Email, Password or Name is not provided.'
+    assert await Users.all().count() == 0
+
+
+async def test_register_reports_an_existing_email(client):
+    assert (await client.get('/register', query_string=USER)).status_code == 200
+
+    response = await client.get('/register', query_string={**USER, 'name': 'Someone Else'})
+
+    assert response.status_code == 400
+    assert (await response.get_json())['message'] == 'User already exists.'
+
+
+async def _login(client) -> dict:
+    await client.get('/register', query_string=USER)
+    response = await client.get('/login', query_string={'email': USER['email'], 'password': USER['password']})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {(await response.get_json())['token']}"}
+
+
+async def test_favorites_require_a_bearer_token(client, create_event):
+    event = await create_event()
+
+    assert (await client.get('/favorites')).status_code == 401
+    assert (await client.post('/set-favorite', query_string={'event_id': event.id, 'favorite': 'true'})).status_code == 401
+    assert (await client.get('/favorites', headers={'Authorization': 'Bearer forged'})).status_code == 401
+
+
+async def test_login_wrong_password_returns_no_token(client):
+    await client.get('/register', query_string=USER)
+
+    response = await client.get('/login', query_string={'email': USER['email'], 'password': 'wrong'})
+
+    assert response.status_code == 400
+    assert 'token' not in await response.get_json()
+
+
+async def test_set_and_list_favorites_with_bearer_token(client, create_event):
+    headers = await _login(client)
+    favorite = await create_event(name='Hamlet')
+    await create_event(name='Kral Lear')
+
+    response = await client.post('/set-favorite', query_string={'event_id': favorite.id, 'favorite': 'true'},
+                                 headers=headers)
+    assert response.status_code == 200
+
+    favorites = (await (await client.get('/favorites', headers=headers)).get_json())['data']
+    assert [(row['name'], row['isFavorite']) for row in favorites] == [('Hamlet', True)]
+
+    events = (await (await client.get('/get-events', query_string={'category': 'normal'}, headers=headers)).get_json())['data']
+    assert {row['name']: row['isFavorite'] for row in events} == {'Hamlet': True, 'Kral Lear': False}
+
+
+async def test_favorites_ndjson_stream_marks_rows_as_favorites(client, create_event):
+    headers = await _login(client)
+    favorite = await create_event(name='Hamlet')
+    await client.post('/set-favorite', query_string={'event_id': favorite.id, 'favorite': 'true'}, headers=headers)
+
+    response = await client.get('/favorites', query_string={'format': 'ndjson'}, headers=headers)
+
+    rows = [json.loads(line) for line in (await response.get_data()).splitlines()]
+    assert [(row['name'], row['isFavorite']) for row in rows] == [('Hamlet', True)]
@@ -0,0 +1,114 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.crawlers.bubilet_crawler import BubiletSource, city_slug, parse_ticket
+from app.dates import EVENT_TIMEZONE
+
+# An enriched ticket as fetch() returns it, places from /Etkinlik/{id}/Mekanlar
+TICKET = json.loads((Path(__file__).parent / 'fixtures' / 'bubilet_ticket.json').read_text(encoding='utf-8'))
+
+CITIES = [
+    {'id': 6, 'adi': 'Ankara', 'etkinlikSayisi': 10},
+    {'id': 34, 'adi': 'İstanbul', 'etkinlikSayisi': 50},
+    {'id': 35, 'adi': 'İzmir', 'etkinlikSayisi': 0},
+]
+
+
+class FakeCrawler:
+    async def get_ticket_cities_and_counts(self):
+        return CITIES
+
+    async def get_latest_tickets(self, ilid=None):
+        return [{'etkinlikId': int(ilid), 'slug': f'event-{ilid}'}, {'etkinlikId': 1, 'slug': 'touring'}]
+
+    def __init__(self, places=None):
+        self.places = places if places is not None else TICKET['places']
+
+    async def enrich_ticket(self, ticket, ilid=None):
+        return {**ticket, 'places': self.places}
+
+
+async def _listings(source: BubiletSource) -> list:
+    return [listing async for listing in source.listings()]
+
+
+@pytest.mark.parametrize('city, slug', [
+    ({'adi': 'İstanbul'}, 'istanbul'),
+    ({'adi': 'Afyon Karahisar'}, 'afyon-karahisar'),
+    ({'adi': 'Muğla', 'slug': 'mugla-bodrum'}, 'mugla-bodrum'),
+])
+def test_city_slug(city, slug):
+    assert city_slug(city) == slug
+
+
+async def test_crawl_of_every_city_is_complete():
+    source = BubiletSource(FakeCrawler())
+
+    listings = await _listings(source)
+
+    assert [(ilid, ticket['slug']) for ilid, ticket in listings] == [
+        ('34', 'event-34'), ('34', 'touring'), ('6', 'event-6'),
+    ]
+    assert source.complete
+
+
+async def test_crawl_of_some_cities_is_not_complete():
+    source = BubiletSource(FakeCrawler(), ilids=[6])
+
+    await _listings(source)
+
+    assert not source.complete
+
+
+async def test_unknown_city_ids_are_rejected():
+    with pytest.raises(ValueError):
+        await _listings(BubiletSource(FakeCrawler(), ilids=[99]))
+
+
+async def test_ticket_url_uses_the_city_of_the_listing():
+    source = BubiletSource(FakeCrawler(), ilids=[6, 34])
+    ilid, ticket = (await _listings(source))[0]
+    (movie,) = await source.fetch((ilid, ticket))
+    movie.update({
+        'etkinlikAdi': 'Hamlet', 'genres': [{'adi': 'Tiyatro'}], 'places': [{'baslik': 'Sahne'}],
+        'prices': [{'sessions': [{'tarih': '2025-03-01T20:00:00', 'indirimliFiyat': 250}]}],
+        'details': {'dosyalar': [], 'ozet': '', 'sure': '90 dk'},
+    })
+
+    assert parse_ticket(movie)['ticket_sites_data'][0]['url'] == 'https://www.bubilet.com.tr/ankara/etkinlik/event-6'
+
+
+def test_parse_ticket():
+    event = parse_ticket(TICKET)
+
+    assert event['external_id'] == '18734'
+    assert (event['name'], event['type'], event['genre']) == ('Hamlet', 'Tiyatro', 'Tiyatro,Dram')
+    assert event['time'] == datetime(2025, 3, 1, 20, 0, tzinfo=EVENT_TIMEZONE)
+    assert event['end_time'] == datetime(2025, 3, 2, 20, 0, tzinfo=EVENT_TIMEZONE)
+    assert event['image_url'] == 'https://cdn.bubilet.com.tr/etkinlik/hamlet-dikey.jpg'
+    assert event['description'] == "Shakespeare'in tragedyası"
+    assert event['venue_data'] == {
+        'external_id': '412', 'name': 'Zorlu PSM', 'city': 'İstanbul', 'latitude': 41.0664, 'longitude': 29.0173,
+    }
+
+
+async def test_missing_venue_coordinates_are_reported(structured_logs):
+    source = BubiletSource(FakeCrawler(places=[{'id': 412, 'baslik': 'Zorlu PSM'}]))
+    listing = (await _listings(source))[0]
+
+    (ticket,) = await source.fetch(listing)
+
+    assert ticket['places'] == [{'id': 412, 'baslik': 'Zorlu PSM'}]
+    errors = [log for log in structured_logs if log['event'] == 'crawl_error']
+    assert [(error['error'], error['venue']) for error in errors] == [('VenueLocationMissing', 'Zorlu PSM')]
+
+
+async def test_venue_coordinates_are_not_reported_when_present(structured_logs):
+    source = BubiletSource(FakeCrawler())
+
+    await source.fetch((await _listings(source))[0])
+
+    assert not [log for log in structured_logs if log['event'] == 'crawl_error']
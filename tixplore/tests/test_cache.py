@@ -0,0 +1,117 @@
+import asyncio
+from datetime import timedelta
+
+from tortoise import connections
+
+from app.cache import CHANGE_CHANNEL, ResponseCache, _change_payload, response_cache
+from app.crawlers.persistence import EventWriter
+from app.dates import start_of_today
+from app.listings import refresh_listings
+
+from conftest import requires_db
+
+
+def _event_data(external_id: str, **fields) -> dict:
+    return {
+        'external_id': external_id, 'name': f'Event {external_id}', 'type': 'Tiyatro', 'genre': 'Tiyatro',
+        'location': 'Sahne', 'time': start_of_today() + timedelta(days=1), 'end_time': None, 'image_url': None,
+        'description': '', 'director': '', 'cast': [], 'duration': '', 'rating': 0, **fields,
+    }
+
+
+def test_invalidate_drops_only_entries_of_the_changed_events():
+    cache = ResponseCache()
+    cache.set('first', cache.build('/get-events', b'1', 'application/json', event_ids=[1, 2]))
+    cache.set('second', cache.build('/get-events', b'2', 'application/json', event_ids=[3]))
+    cache.set('unknown', cache.build('/get-events', b'3', 'application/json'))
+    cache.set('favorites', cache.build('/favorites', b'4', 'application/json', event_ids=[]))
+
+    cache.invalidate([2], paths=['/favorites'])
+
+    assert cache.generation == 1
+    assert cache.get('second') is not None
+    assert all(cache.get(key) is None for key in ('first', 'unknown', 'favorites'))
+
+    cache.invalidate()
+
+    assert cache.generation == 2
+    assert cache.get('second') is None
+
+
+@requires_db
+async def test_etag_revalidation_returns_304(client, create_event):
+    await create_event()
+    query_string = {'category': 'normal'}
+
+    response = await client.get('/get-events', query_string=query_string)
+    etag = response.headers['ETag']
+
+    response = await client.get('/get-events', query_string=query_string, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert await response.get_data() == b''
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    response = await client.get('/get-events', query_string=query_string, headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+
+
+@requires_db
+async def test_response_built_during_a_write_is_not_cached(client, create_event, monkeypatch):
+    from app.api import routes
+
+    await create_event()
+    paginate = routes.paginate
+
+    async def paginate_during_write(*args, **kwargs):
+        page = await paginate(*args, **kwargs)
+        response_cache.invalidate()
+        return page
+
+    monkeypatch.setattr(routes, 'paginate', paginate_during_write)
+    response = await client.get('/get-events', query_string={'category': 'normal'})
+
+    assert response.status_code == 200
+    assert len(response_cache._entries) == 0
+
+
+@requires_db
+async def test_change_notifications_invalidate_other_workers(client, create_event):
+    cached, other = await create_event(), await create_event()
+    await refresh_listings([cached.id, other.id])
+    await client.get('/get-events', query_string={'category': 'normal', 'limit': 1})
+    assert len(response_cache._entries) == 1
+
+    # Sent by another worker, so only the LISTEN connection of this one sees it
+    await connections.get('default').execute_query(
+        "SELECT pg_notify($1, $2)", [CHANGE_CHANNEL, _change_payload([other.id], ())]
+    )
+    await asyncio.sleep(0.2)
+    assert len(response_cache._entries) == 1
+
+    await connections.get('default').execute_query(
+        "SELECT pg_notify($1, $2)", [CHANGE_CHANNEL, _change_payload([cached.id], ())]
+    )
+    for _ in range(50):
+        if not response_cache._entries:
+            break
+        await asyncio.sleep(0.02)
+    assert len(response_cache._entries) == 0
+
+
+@requires_db
+async def test_writer_keeps_pages_of_other_events_when_it_only_updates(client):
+    later = start_of_today() + timedelta(days=2)
+    async with EventWriter('bubilet', incremental=False) as writer:
+        await writer.add(_event_data('1'))
+        await writer.add(_event_data('2', time=later))
+
+    await client.get('/get-events', query_string={'category': 'normal', 'limit': 1})
+    assert len(response_cache._entries) == 1
+
+    async with EventWriter('bubilet', incremental=False) as writer:
+        await writer.add(_event_data('2', name='Renamed', time=later))
+    assert len(response_cache._entries) == 1
+
+    async with EventWriter('bubilet', incremental=False) as writer:
+        await writer.add(_event_data('3'))
+    assert len(response_cache._entries) == 0
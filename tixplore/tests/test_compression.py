@@ -0,0 +1,81 @@
+import gzip
+import json
+
+import pytest
+
+from app.api import responses
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+async def _create_events(create_event, count: int = 10):
+    # Enough listing rows for the body to pass COMPRESSION_MIN_SIZE
+    for _ in range(count):
+        await create_event(description='Uzun bir açıklama ' * 10)
+
+
+async def _get_events(client, accept_encoding=None):
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+    return await client.get('/get-events', query_string={'category': 'normal'}, headers=headers)
+
+
+async def test_gzip_is_negotiated(client, create_event):
+    await _create_events(create_event)
+
+    response = await _get_events(client, 'gzip, deflate')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = json.loads(gzip.decompress(await response.get_data()))
+    assert len(body['data']) == 10
+
+
+async def test_brotli_is_preferred_over_gzip(client, create_event, monkeypatch):
+    brotli = pytest.importorskip('brotli')
+    monkeypatch.setattr(responses, 'brotli', brotli)
+    await _create_events(create_event)
+
+    response = await _get_events(client, 'gzip, br')
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert len(json.loads(brotli.decompress(await response.get_data()))['data']) == 10
+
+
+async def test_brotli_is_skipped_when_not_installed(client, create_event, monkeypatch):
+    monkeypatch.setattr(responses, 'brotli', None)
+    await _create_events(create_event)
+
+    response = await _get_events(client, 'br')
+
+    assert 'Content-Encoding' not in response.headers
+    assert len(json.loads(await response.get_data())['data']) == 10
+
+
+async def test_small_and_unaccepted_bodies_are_not_compressed(client, create_event):
+    await create_event()
+
+    small = await _get_events(client, 'gzip')
+    assert 'Content-Encoding' not in small.headers
+    assert 'Accept-Encoding' in small.headers['Vary']
+
+    await _create_events(create_event)
+    plain = await client.get('/get-events', query_string={'category': 'normal', 'limit': 20})
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+
+async def test_cached_responses_are_kept_per_encoding(client, create_event):
+    await _create_events(create_event)
+
+    compressed = await _get_events(client, 'gzip')
+    plain = await _get_events(client)
+    compressed_again = await _get_events(client, 'gzip')
+
+    assert 'Content-Encoding' not in plain.headers
+    assert json.loads(await plain.get_data()) == json.loads(gzip.decompress(await compressed.get_data()))
+    assert plain.headers['ETag'] != compressed.headers['ETag']
+    assert compressed_again.headers['Content-Encoding'] == 'gzip'
+    assert compressed_again.headers['ETag'] == compressed.headers['ETag']
+    assert 'Accept-Encoding' in compressed_again.headers['Vary']
@@ -0,0 +1,27 @@
+import pytest
+
+from app.crawlers import bubilet_crawler
+from app.crawlers.locks import CrawlLocked, crawl_lock
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+async def test_a_source_is_crawled_by_one_process_at_a_time():
+    async with crawl_lock('bubilet'):
+        with pytest.raises(CrawlLocked):
+            async with crawl_lock('bubilet'):
+                pass
+        # Other sources are not held up
+        async with crawl_lock('passo'):
+            pass
+
+    async with crawl_lock('bubilet'):
+        pass
+
+
+async def test_manual_crawl_does_not_overlap_a_running_crawl():
+    async with crawl_lock('bubilet'):
+        with pytest.raises(CrawlLocked):
+            await bubilet_crawler.crawl()
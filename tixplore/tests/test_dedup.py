@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+
+from app.dedup import best_match, event_date, name_key, resolve_duplicates, score, similarity
+from app.models import Events
+
+from conftest import requires_db
+
+
+def _event(id: int, name: str, location: str, source: str = 'bubilet') -> dict:
+    return {
+        'id': id, 'source': source, 'name_key': name_key(name), 'location': location,
+        'event_date': date(2025, 3, 1), 'canonical_id': None,
+    }
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Hamlet - Devlet Tiyatroları', 'Devlet Tiyatroları: Hamlet'),
+    ('CEM YILMAZ', 'Cem Yılmaz'),
+    ('Duman Konseri', 'Duman Konser'),
+    ('Anna Karenina', 'Ana Karenina'),
+])
+def test_similarity_matches_spelling_and_word_order_variants(a, b):
+    assert similarity(name_key(a), name_key(b)) == 1.0
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Hamlet', 'Hamlet Müzikali'),
+    ('Kral Lear', 'Kral Übü'),
+    ('Romeo ve Juliet', 'Romeo ve Juliet Bale'),
+    ('Zorlu PSM', 'Zorlu PSM Turkcell Sahnesi'),
+    ('Duman', 'Mor ve Ötesi'),
+])
+def test_similarity_is_symmetric_and_below_one_for_near_misses(a, b):
+    forward, backward = similarity(name_key(a), name_key(b)), similarity(name_key(b), name_key(a))
+    assert forward == backward
+    assert forward < 1.0
+
+
+@pytest.mark.parametrize('name, candidate_name', [
+    ('Hamlet', 'Hamlet Müzikali'),
+    ('Kral Lear', 'Kral Übü'),
+    ('Bir Baba Hamlet', 'Hamlet'),
+])
+def test_near_miss_titles_at_the_same_venue_do_not_match(name, candidate_name):
+    event = _event(1, name, 'Harbiye Muhsin Ertuğrul Sahnesi')
+    candidate = _event(2, candidate_name, 'Harbiye Muhsin Ertuğrul Sahnesi', source='passo')
+
+    assert best_match(event, [candidate]) is None
+
+
+def test_same_show_with_reordered_title_and_longer_venue_name_matches():
+    event = _event(1, 'Hamlet - Devlet Tiyatroları', 'Zorlu PSM')
+    near_miss = _event(2, 'Hamlet Müzikali', 'Zorlu PSM', source='passo')
+    same = _event(3, 'Devlet Tiyatroları: Hamlet', 'Zorlu PSM Turkcell Sahnesi', source='passo')
+
+    assert score(event, same) >= score(event, near_miss)
+    assert best_match(event, [near_miss, same]) is same
+
+
+@requires_db
+async def test_resolve_duplicates_links_events_of_other_sources(test_app, create_event):
+    async def create(name, source, external_id):
+        event = await create_event(name=name, location='Zorlu PSM', source=source, external_id=external_id)
+        event.name_key, event.event_date = name_key(name), event_date(event.time)
+        await event.save()
+        return event
+
+    bubilet = await create('Hamlet', 'bubilet', '1')
+    passo = await create('HAMLET', 'passo', '1')
+    musical = await create('Hamlet Müzikali', 'passo', '2')
+
+    affected = await resolve_duplicates([bubilet.id, passo.id, musical.id])
+
+    canonical = dict(await Events.all().values_list('id', 'canonical_id'))
+    group = canonical[bubilet.id] or canonical[passo.id]
+    assert {canonical[bubilet.id], canonical[passo.id]} == {None, group}
+    assert canonical[musical.id] is None
+    assert {group, musical.id} <= affected
@@ -0,0 +1,151 @@
+import json
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+
+from app import app
+from app.cache import response_cache
+from app.dates import EVENT_TIMEZONE, start_of_today
+from app.listings import refresh_listings
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+async def _listing_queries(client, structured_logs) -> int:
+    response_cache.invalidate()
+    response = await client.get('/get-events', query_string={'category': 'normal', 'limit': 50})
+    assert response.status_code == 200
+    request = [event for event in structured_logs if event['event'] == 'request'][-1]
+    structured_logs.clear()
+    return request['db_queries']
+
+
+async def test_event_listing_query_count_does_not_grow_with_events(client, create_event, structured_logs):
+    events = [await create_event() for _ in range(3)]
+    await refresh_listings(event.id for event in events)
+    few = await _listing_queries(client, structured_logs)
+
+    events = [await create_event() for _ in range(30)]
+    await refresh_listings(event.id for event in events)
+    many = await _listing_queries(client, structured_logs)
+
+    assert few > 0
+    assert many == few
+
+
+async def test_event_listing_builds_missing_rows(client, create_event):
+    event = await create_event(name='Hamlet')
+
+    response = await client.get('/get-events', query_string={'category': 'normal'})
+
+    data = (await response.get_json())['data']
+    assert [row['name'] for row in data] == ['Hamlet']
+    assert data[0]['id'] == str(event.id)
+    assert data[0]['isFavorite'] is False
+
+
+async def test_ndjson_stream_builds_missing_rows_and_sets_is_favorite(client, create_event):
+    stored = await create_event(name='Hamlet')
+    await refresh_listings([stored.id])
+    await create_event(name='Kral Lear')
+
+    response = await client.get('/get-events', query_string={'category': 'normal', 'format': 'ndjson'})
+
+    assert response.content_type == 'application/x-ndjson'
+    rows = [json.loads(line) for line in (await response.get_data()).splitlines()]
+    assert sorted(row['name'] for row in rows) == ['Hamlet', 'Kral Lear']
+    assert all(row['isFavorite'] is False for row in rows)
+
+
+async def test_event_listing_caps_limit(client, create_event, monkeypatch):
+    monkeypatch.setitem(app.config, 'PAGE_SIZE_MAX', 3)
+    for _ in range(5):
+        await create_event()
+
+    response = await client.get('/get-events', query_string={'category': 'normal', 'limit': 100})
+
+    body = await response.get_json()
+    assert len(body['data']) == 3
+    assert body['next_cursor'] is not None
+
+
+async def test_event_listing_cursor_walks_every_event_once(client, create_event):
+    events = [await create_event() for _ in range(7)]
+
+    names, cursor = [], None
+    while True:
+        query_string = {'category': 'normal', 'limit': 3}
+        if cursor:
+            query_string['cursor'] = cursor
+        body = await (await client.get('/get-events', query_string=query_string)).get_json()
+        names += [row['name'] for row in body['data']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert names == [event.name for event in events]
+
+
+async def test_event_listing_rejects_bad_cursor_and_limit(client):
+    response = await client.get('/get-events', query_string={'category': 'normal', 'cursor': 'garbage'})
+    assert response.status_code == 400
+    assert (await response.get_json())['message'] == 'Invalid cursor.'
+
+    response = await client.get('/get-events', query_string={'category': 'normal', 'limit': 0})
+    assert response.status_code == 400
+    assert (await response.get_json())['message'] == 'Invalid limit.'
+
+
+async def _listed(client, **query_string) -> list:
+    response = await client.get('/get-events', query_string={'category': 'normal', **query_string})
+    if response.status_code == 404:
+        return []
+    return [row['name'] for row in (await response.get_json())['data']]
+
+
+async def test_event_listing_filters_by_local_days(client, create_event):
+    day = (start_of_today() + timedelta(days=10)).date()
+    await create_event(name='Before', time=datetime.combine(day - timedelta(days=1), time(20), EVENT_TIMEZONE))
+    await create_event(name='Morning', time=datetime.combine(day, time(0, 30), EVENT_TIMEZONE))
+    await create_event(name='Evening', time=datetime.combine(day, time(23, 30), EVENT_TIMEZONE))
+    await create_event(name='After', time=datetime.combine(day + timedelta(days=1), time(0, 30), EVENT_TIMEZONE))
+    await create_event(name='Running', time=datetime.combine(day - timedelta(days=3), time(20), EVENT_TIMEZONE),
+                       end_time=datetime.combine(day + timedelta(days=3), time(20), EVENT_TIMEZONE))
+
+    # A date without a time is the whole local day, to included
+    assert await _listed(client, **{'from': day.isoformat(), 'to': day.isoformat()}) == ['Running', 'Morning', 'Evening']
+
+
+async def test_event_listing_takes_times_without_an_offset_as_istanbul_time(client, create_event):
+    day = (start_of_today() + timedelta(days=10)).date()
+    # 00:30 in Istanbul is 21:30 UTC of the day before
+    await create_event(name='Midnight', time=datetime.combine(day, time(0, 30), EVENT_TIMEZONE))
+
+    assert await _listed(client, **{'from': f'{day}T00:00', 'to': f'{day}T01:00'}) == ['Midnight']
+    assert await _listed(client, **{'from': f'{day}T00:00Z', 'to': f'{day}T01:00Z'}) == []
+    utc = datetime.combine(day, time(0, 30), EVENT_TIMEZONE).astimezone(timezone.utc)
+    assert await _listed(client, **{'from': utc.isoformat(), 'to': (utc + timedelta(minutes=1)).isoformat()}) == ['Midnight']
+
+
+async def test_event_listing_leaves_out_past_events_unless_asked(client, create_event):
+    await create_event(name='Yesterday', time=start_of_today() - timedelta(hours=12))
+    await create_event(name='Tomorrow')
+
+    assert await _listed(client) == ['Tomorrow']
+    yesterday = (start_of_today() - timedelta(days=1)).date().isoformat()
+    assert await _listed(client, **{'from': yesterday}) == ['Yesterday', 'Tomorrow']
+
+
+@pytest.mark.parametrize('query_string', [
+    {'from': 'tomorrow'},
+    {'to': '2025-13-01'},
+    {'from': '2025-05-05', 'to': '2025-05-04'},
+    {'from': '2025-05-04T12:00', 'to': '2025-05-04T12:00'},
+])
+async def test_event_listing_rejects_invalid_date_ranges(client, query_string):
+    response = await client.get('/get-events', query_string={'category': 'normal', **query_string})
+
+    assert response.status_code == 400
+    assert (await response.get_json())['message'] == 'Invalid date range.'
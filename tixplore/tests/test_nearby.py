@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+import pytest
+
+from app.dates import start_of_today
+from app.models import Venues
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+# Taksim Square
+HERE = {'lat': 41.0370, 'lon': 28.9850}
+
+
+async def _venue(name: str, latitude: float, longitude: float) -> Venues:
+    return await Venues.create(source='passo', external_id=name, name=name, latitude=latitude, longitude=longitude)
+
+
+async def test_nearby_events_are_ordered_by_distance_within_the_radius(client, create_event):
+    # About 1.6 km, 4.2 km and 6.4 km from HERE
+    harbiye = await _venue('Harbiye', 41.0480, 28.9970)
+    zorlu = await _venue('Zorlu PSM', 41.0664, 29.0173)
+    kadikoy = await _venue('Kadıköy', 40.9900, 29.0290)
+    far = await create_event(name='Far', venue_id=zorlu.id)
+    near = await create_event(name='Near', venue_id=harbiye.id)
+    await create_event(name='Outside', venue_id=kadikoy.id)
+    await create_event(name='Past', venue_id=harbiye.id, time=start_of_today() - timedelta(days=1))
+    await create_event(name='Inactive', venue_id=harbiye.id, is_active=False)
+
+    response = await client.get('/events/nearby', query_string={**HERE, 'radius': 5000})
+
+    data = (await response.get_json())['data']
+    assert [row['name'] for row in data] == ['Near', 'Far']
+    assert [row['id'] for row in data] == [str(near.id), str(far.id)]
+    assert 1400 < data[0]['distance'] < 1800 and 4000 < data[1]['distance'] < 4500
+
+    response = await client.get('/events/nearby', query_string={**HERE, 'radius': 2000})
+    assert [row['name'] for row in (await response.get_json())['data']] == ['Near']
+
+
+@pytest.mark.parametrize('query_string, message', [
+    ({'lat': 41.0}, 'lat and lon are not provided.'),
+    ({'lat': 'north', 'lon': 29.0}, 'lat and lon are not provided.'),
+    ({'lat': 91, 'lon': 29.0}, 'Invalid location or radius.'),
+    ({**HERE, 'radius': 'far'}, 'Invalid location or radius.'),
+    ({**HERE, 'radius': 0}, 'Invalid location or radius.'),
+    ({**HERE, 'radius': 50001}, 'Invalid location or radius.'),
+    ({**HERE, 'limit': 0}, 'Invalid limit.'),
+    ({**HERE, 'from': 'tomorrow'}, 'Invalid date range.'),
+])
+async def test_nearby_rejects_bad_parameters(client, query_string, message):
+    response = await client.get('/events/nearby', query_string=query_string)
+
+    assert response.status_code == 400
+    assert (await response.get_json())['message'] == message
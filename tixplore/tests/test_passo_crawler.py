@@ -0,0 +1,49 @@
+from app.crawlers.passo_crawler import PassoSource, parse_event
+
+VENUE = {'id': 306216, 'seo_url': 'volkswagen-arena-etkinlik-biletleri', 'name': 'Volkswagen Arena'}
+EVENT_DETAILS = {'value': {
+    'id': 7, 'name': 'Duman', 'genreName': 'Konser', 'subGenreName': 'Rock', 'venueId': 306216,
+    'venueName': 'Volkswagen Arena', 'date': '2025-03-01T21:00:00', 'seoUrl': 'duman-konseri',
+    'categories': [{'name': 'Kategori 1', 'price': 900.0}],
+}}
+
+
+class FakeCrawler:
+    def __init__(self, venue_details: dict):
+        self.venue_details = venue_details
+
+    def get_venues(self):
+        return [VENUE]
+
+    async def get_venue_details(self, venue_seo_url, venue_id, culture_id='118'):
+        return {'value': {**self.venue_details, 'venueEvents': [{'id': 7, 'seoUrl': 'duman-konseri'}]}}
+
+    async def get_event_details(self, event_seo_url, event_id, culture_id='118'):
+        return EVENT_DETAILS
+
+
+async def _parsed_events(source: PassoSource) -> list:
+    return [parse_event(*await source.fetch(listing)) async for listing in source.listings()]
+
+
+async def test_venue_coordinates_come_from_the_venue_details(structured_logs):
+    source = PassoSource(FakeCrawler({'name': 'Volkswagen Arena', 'cityName': 'İstanbul',
+                                      'latitude': '41.1083', 'longitude': '29.0055'}))
+
+    (event,) = await _parsed_events(source)
+
+    assert event['venue_data'] == {
+        'external_id': '306216', 'name': 'Volkswagen Arena', 'city': 'İstanbul',
+        'latitude': 41.1083, 'longitude': 29.0055,
+    }
+    assert not [log for log in structured_logs if log['event'] == 'crawl_error']
+
+
+async def test_missing_venue_coordinates_are_reported(structured_logs):
+    source = PassoSource(FakeCrawler({'name': 'Volkswagen Arena'}))
+
+    (event,) = await _parsed_events(source)
+
+    assert (event['venue_data']['latitude'], event['venue_data']['longitude']) == (None, None)
+    errors = [log for log in structured_logs if log['event'] == 'crawl_error']
+    assert [(error['error'], error['venue']) for error in errors] == [('VenueLocationMissing', 'Volkswagen Arena')]
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from app.crawlers.persistence import EventWriter
+from app.crawlers.pipeline import Pipeline, SourceAdapter
+from app.dates import start_of_today
+from app.models import Events
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def _event_data(external_id: str) -> dict:
+    return {
+        'external_id': external_id, 'name': f'Event {external_id}', 'type': 'Tiyatro', 'genre': 'Tiyatro',
+        'location': 'Sahne', 'time': start_of_today() + timedelta(days=1), 'end_time': None, 'image_url': None,
+        'description': '', 'director': '', 'cast': [], 'duration': '', 'rating': 0,
+    }
+
+
+def _parse(data: dict) -> dict:
+    return dict(data)
+
+
+class FakeSource(SourceAdapter):
+    source = 'bubilet'
+    parse = staticmethod(_parse)
+
+    def __init__(self, listings):
+        self.entries = listings
+        self.outcomes = {}
+
+    async def listings(self):
+        for entry in self.entries:
+            yield entry
+
+    def external_id(self, listing):
+        return listing['external_id']
+
+    async def fetch(self, listing):
+        return (listing,)
+
+    def done(self, listing, succeeded):
+        self.outcomes[listing['external_id']] = succeeded
+
+
+async def test_a_failed_batch_reports_all_of_its_events_as_failed(test_app):
+    stale = await Events.create(**_event_data('stale'), source='bubilet')
+    broken = {**_event_data('2'), 'name': None}
+    source = FakeSource([_event_data('1'), broken, _event_data('3')])
+
+    async with EventWriter('bubilet', batch_size=2, incremental=False) as writer:
+        pipeline = Pipeline(source, writer, fetch_workers=1, parse_workers=1)
+        await pipeline.run()
+
+    assert source.outcomes == {'1': False, '2': False, '3': True}
+    assert (writer.written, writer.failed) == (1, 2)
+    assert set(await Events.filter(is_active=True).values_list('external_id', flat=True)) == {'3', 'stale'}
+    # A crawl with a failed batch never deactivates events
+    assert not pipeline.complete
+    assert (await Events.get(id=stale.id)).is_active
+
+
+async def test_touches_and_adds_are_reported_once_committed(test_app):
+    await Events.create(**_event_data('1'), source='bubilet', content_hash='old')
+    writer = EventWriter('bubilet', batch_size=10)
+    outcomes = []
+
+    async with writer:
+        await writer.touch('1', outcomes.append)
+        await writer.add(_event_data('2'), outcomes.append)
+        assert outcomes == []
+
+    assert outcomes == [True, True]
+    assert (writer.written, writer.skipped) == (1, 1)
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+from tortoise import connections
+
+from app.models import TicketSites
+from app.prices import ensure_partitions
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+async def _observe(event_id: int, site: str, price: float, observed_at: datetime):
+    await connections.get('default').execute_query(
+        "INSERT INTO price_observations (event_id, site, price, observed_at) VALUES ($1, $2, $3, $4)",
+        [event_id, site, price, observed_at],
+    )
+
+
+async def test_cheapest_offer_spans_the_duplicate_group(client, create_event):
+    canonical = await create_event(source='passo')
+    duplicate = await create_event(source='bubilet', canonical_id=canonical.id)
+    retired = await create_event(source='biletix', canonical_id=canonical.id, is_active=False)
+    await TicketSites.create(event_id=canonical.id, name='Passo', price=300, url='https://passo')
+    await TicketSites.create(event_id=duplicate.id, name='Bubilet', price=250, url='https://bubilet')
+    await TicketSites.create(event_id=retired.id, name='Biletix', price=100, url='https://biletix')
+
+    for event in (canonical, duplicate):
+        response = await client.get('/cheapest-offer', query_string={'event_id': event.id})
+        data = (await response.get_json())['data']
+        assert (data['name'], data['price']) == ('Bubilet', 250)
+
+
+async def test_cheapest_offer_errors(client, create_event):
+    event = await create_event()
+
+    response = await client.get('/cheapest-offer', query_string={'event_id': event.id})
+    assert response.status_code == 404
+
+    response = await client.get('/cheapest-offer', query_string={'event_id': 'abc'})
+    assert response.status_code == 400
+
+
+async def test_price_history_buckets_observations(client, create_event):
+    await ensure_partitions()
+    event = await create_event()
+    now = datetime.now(timezone.utc)
+    for price in (100, 200):
+        await _observe(event.id, 'Passo', price, now)
+    await _observe(event.id, 'Bubilet', 150, now)
+
+    response = await client.get('/price-history', query_string={'event_id': event.id})
+
+    data = (await response.get_json())['data']
+    assert [(row['site'], row['min_price'], row['max_price'], row['observations']) for row in data] == [
+        ('Bubilet', 150, 150, 1), ('Passo', 100, 200, 2),
+    ]
+
+
+async def test_price_history_takes_times_without_an_offset_as_local(client, create_event):
+    event = await create_event()
+    # 01:30 on May 4th in Istanbul, still May 3rd in UTC
+    await _observe(event.id, 'Passo', 100, datetime(2025, 5, 3, 22, 30, tzinfo=timezone.utc))
+
+    response = await client.get('/price-history', query_string={
+        'event_id': event.id, 'from': '2025-05-04', 'to': '2025-05-05T00:00',
+    })
+    assert [row['observations'] for row in (await response.get_json())['data']] == [1]
+
+    response = await client.get('/price-history', query_string={
+        'event_id': event.id, 'from': '2025-05-04T00:00+00:00', 'to': '2025-05-05T00:00Z',
+    })
+    assert (await response.get_json())['data'] == []
+
+
+async def test_price_history_rejects_bad_parameters(client):
+    for query_string in (
+        {'event_id': 'abc'},
+        {'event_id': 1, 'bucket': 'minute'},
+        {'event_id': 1, 'from': 'yesterday'},
+    ):
+        response = await client.get('/price-history', query_string=query_string)
+        assert response.status_code == 400
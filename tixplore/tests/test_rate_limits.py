@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+import quart_rate_limiter
+from quart_rate_limiter import QUART_RATE_LIMITER_LIMITS_ATTRIBUTE
+
+from app import app, index_client
+from app.config import Config
+from app.models import ApiKeys
+from app.rate_limits import EXPORT_COST
+from app.security import hash_api_key
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+API_KEY = 'test-api-key'
+
+
+class FrozenDatetime(datetime):
+    """Stops the limiter's clock, so budgets do not refill while a test runs"""
+    now_value = datetime(2025, 5, 4, 12, 0)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now_value
+
+
+@pytest.fixture(autouse=True)
+def frozen_clock(monkeypatch):
+    monkeypatch.setattr(quart_rate_limiter, 'datetime', FrozenDatetime)
+
+
+async def _statuses(client, count: int, path: str = '/', **kwargs) -> list:
+    return [(await client.get(path, **kwargs)).status_code for _ in range(count)]
+
+
+async def test_anonymous_clients_get_the_default_budget(client):
+    statuses = await _statuses(client, Config.RATE_LIMIT_DEFAULT + 1)
+
+    assert statuses == [200] * Config.RATE_LIMIT_DEFAULT + [429]
+
+
+async def test_api_key_holders_get_a_larger_budget(client):
+    async with app.app_context():
+        await ApiKeys.create(name='test', key_hash=hash_api_key(API_KEY))
+    keyed = Config.RATE_LIMIT_DEFAULT * Config.RATE_LIMIT_API_KEY_FACTOR
+
+    statuses = await _statuses(client, keyed + 1, headers={'X-API-Key': API_KEY})
+
+    assert statuses == [200] * keyed + [429]
+    # The anonymous budget of the same address is separate
+    assert await _statuses(client, 1) == [200]
+
+
+async def test_an_invalid_api_key_gets_the_anonymous_budget(client):
+    statuses = await _statuses(client, Config.RATE_LIMIT_DEFAULT + 1, headers={'X-API-Key': 'guessed'})
+
+    assert statuses[-1] == 429
+
+
+async def test_exports_cost_more_of_the_events_budget(client, create_event):
+    await create_event()
+    exports = Config.RATE_LIMIT_EVENTS // EXPORT_COST
+
+    statuses = await _statuses(client, exports + 1, '/get-events', query_string={'category': 'normal', 'format': 'ndjson'})
+
+    assert statuses == [200] * exports + [429]
+
+
+async def test_route_limits_do_not_grow_across_requests(client):
+    limits = getattr(index_client, QUART_RATE_LIMITER_LIMITS_ATTRIBUTE)
+    count = len(limits)
+
+    await _statuses(client, 3)
+
+    assert len(limits) == count
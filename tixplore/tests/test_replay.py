@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+import pytest
+from tortoise import connections
+
+from app.crawlers.http_client import HttpClient
+from app.crawlers.persistence import EventWriter
+from app.crawlers.response_store import ReplayMiss, ResponseStore
+from app.dates import start_of_today
+from app.models import TicketSites
+
+from conftest import requires_db
+
+URL = 'https://apiv2.bubilet.com.tr/api/Anasayfa/6/Etkinlikler'
+
+
+async def test_replay_answers_from_the_store_without_a_session(tmp_path):
+    store = ResponseStore(str(tmp_path))
+    await store.save(store.request_key(URL, {'ilid': '34'}), URL, b'[{"id": 1}]', etag='"v1"')
+
+    async with HttpClient(store=store, replay=True) as client:
+        assert client.session is None
+        assert await client.get_json(URL, headers={'ilid': '34'}) == [{'id': 1}]
+        # ilid changes the response, so another city is a different request
+        with pytest.raises(ReplayMiss):
+            await client.get_json(URL, headers={'ilid': '6'})
+
+
+def test_replay_needs_a_store():
+    with pytest.raises(ValueError):
+        HttpClient(replay=True)
+
+
+def _event_data(external_id: str, price: float) -> dict:
+    return {
+        'external_id': external_id, 'content_hash': external_id, 'name': 'Hamlet', 'type': 'Tiyatro',
+        'genre': 'Tiyatro', 'location': 'Sahne', 'time': start_of_today() + timedelta(days=1), 'end_time': None,
+        'image_url': None, 'description': '', 'director': '', 'cast': [], 'duration': '', 'rating': 0,
+        'ticket_sites_data': [{'name': 'bubilet', 'price': price, 'url': 'https://www.bubilet.com.tr/'}],
+    }
+
+
+async def _price_observations() -> int:
+    _, rows = await connections.get('default').execute_query('SELECT count(*) AS count FROM price_observations')
+    return rows[0]['count']
+
+
+@requires_db
+@pytest.mark.parametrize('observe_prices, observations', [(True, 1), (False, 0)])
+async def test_replayed_prices_are_not_recorded(test_app, observe_prices, observations):
+    async with EventWriter('bubilet', incremental=False, observe_prices=observe_prices) as writer:
+        await writer.add(_event_data('1', 250.0))
+
+    assert await TicketSites.filter(event__external_id='1').values_list('price', flat=True) == [250.0]
+    assert await _price_observations() == observations
@@ -0,0 +1,25 @@
+from app.dedup import event_date
+from app.models import Events, UserFavorites, Users
+from app.onetime.retire_legacy_events import retire_legacy_events
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+async def test_legacy_events_are_deactivated_and_their_favorites_moved(test_app, create_event):
+    user = await Users.create(email='ada@example.com', password='x', name='Ada')
+    legacy = await create_event(name='HAMLET', location='Zorlu PSM')
+    unmatched = await create_event(name='Kral Lear', location='Zorlu PSM')
+    crawled = await create_event(name='Hamlet', location='Zorlu PSM', time=legacy.time, source='bubilet',
+                                 external_id='1')
+    await Events.filter(id=crawled.id).update(name_key='hamlet', event_date=event_date(legacy.time))
+    await UserFavorites.create(user=user, event=legacy)
+    await UserFavorites.create(user=user, event=unmatched)
+
+    assert await retire_legacy_events() == (2, 1)
+
+    active = await Events.filter(is_active=True).values_list('id', flat=True)
+    assert active == [crawled.id]
+    favorites = set(await UserFavorites.filter(user=user).values_list('event_id', flat=True))
+    assert favorites == {crawled.id, unmatched.id}
@@ -0,0 +1,64 @@
+import pytest
+
+from app.api.search import search_terms
+
+from conftest import requires_db
+
+
+@pytest.mark.parametrize('search_text, terms', [
+    ('İSTANBUL Konseri', ['istanbul', 'konseri']),
+    ('KADIKÖY', ['kadıköy']),
+    ("rock'n roll!", ['rock', 'n', 'roll']),
+    ('   ', []),
+])
+def test_search_terms(search_text, terms):
+    assert search_terms(search_text) == terms
+
+
+async def _search(client, search_text: str, **query_string) -> list:
+    response = await client.get('/get-events', query_string={
+        'category': 'normal', 'search_text': search_text, **query_string,
+    })
+    if response.status_code == 404:
+        return []
+    return [row['name'] for row in (await response.get_json())['data']]
+
+
+@requires_db
+async def test_name_matches_rank_above_genre_and_description_matches(client, search_index, create_event):
+    await create_event(name='Akşam Programı', description='Bir caz gecesi')
+    await create_event(name='Şehir Sesleri', genre='Caz,Konser')
+    await create_event(name='Caz Festivali')
+
+    assert await _search(client, 'caz') == ['Caz Festivali', 'Şehir Sesleri', 'Akşam Programı']
+
+
+@requires_db
+@pytest.mark.parametrize('search_text', ['kadikoy', 'KADIKÖY', 'Kadıköy', 'kadık'])
+async def test_search_folds_case_and_accents(client, search_index, create_event, search_text):
+    await create_event(name='Kadıköy Sahnesi')
+    await create_event(name='Beşiktaş Sahnesi')
+
+    assert await _search(client, search_text) == ['Kadıköy Sahnesi']
+
+
+@requires_db
+async def test_search_results_page_by_rank(client, search_index, create_event):
+    for count in range(1, 6):
+        # More repetitions of the term rank higher
+        await create_event(name=f'Tiyatro {count}', description=' '.join(['hamlet'] * count))
+    await create_event(name='Başka Bir Oyun')
+
+    names, cursor = [], None
+    while True:
+        query_string = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        response = await client.get('/get-events', query_string={
+            'category': 'normal', 'search_text': 'hamlet', **query_string,
+        })
+        body = await response.get_json()
+        names += [row['name'] for row in body['data']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert names == [f'Tiyatro {count}' for count in range(5, 0, -1)]
@@ -0,0 +1,21 @@
+import pytest
+
+from app.dedup import name_key
+from app.genres import genre_key
+from app.text import text_key
+
+
+@pytest.mark.parametrize('value, key, folded', [
+    ('İSTANBUL', 'istanbul', 'istanbul'),
+    ('  Stand   Up ', 'stand up', 'stand up'),
+    ('KADIKÖY Sahne', 'kadıköy sahne', 'kadikoy sahne'),
+    ('Hamlet: Bir Trajedi', 'hamlet: bir trajedi', 'hamlet bir trajedi'),
+])
+def test_text_key(value, key, folded):
+    assert text_key(value) == key
+    assert text_key(value, fold_accents=True) == folded
+
+
+def test_genre_and_name_keys_share_the_text_key():
+    assert genre_key('Stand Up') == text_key('Stand Up')
+    assert name_key('Kadıköy') == name_key('KADIKOY') == text_key('Kadıköy', fold_accents=True)